@@ -0,0 +1,82 @@
+"""Compare the AES backends used to encrypt host passwords in gcm.conf."""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import os
+import time
+
+from gnome_connection_manager import app
+
+
+def bench_backend(backend, passwords: list[str], secret: str, cached: bool) -> tuple[float, float]:
+    app.AES_BACKEND = backend
+    scope = app.cipher_cache if cached else contextlib.nullcontext
+    start = time.perf_counter()
+    with scope():
+        ciphertexts = [app.encrypt(secret, password) for password in passwords]
+    encrypt_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with scope():
+        plaintexts = [app.decrypt(secret, ciphertext) for ciphertext in ciphertexts]
+    decrypt_time = time.perf_counter() - start
+
+    if plaintexts != passwords:
+        raise SystemExit(f"{backend.name}: round trip mismatch")
+    return encrypt_time, decrypt_time
+
+
+def bench_backend_bulk(backend, passwords: list[str], secret: str) -> tuple[float, float]:
+    app.AES_BACKEND = backend
+    start = time.perf_counter()
+    ciphertexts = app.encrypt_many(secret, passwords)
+    encrypt_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plaintexts = app.decrypt_many(secret, ciphertexts)
+    decrypt_time = time.perf_counter() - start
+
+    if plaintexts != passwords:
+        raise SystemExit(f"{backend.name}: bulk round trip mismatch")
+    return encrypt_time, decrypt_time
+
+
+def check_compatible(secret: str) -> None:
+    """Every backend must produce the same bytes for the same key and iv."""
+    key = app._password_to_key(secret)
+    iv = os.urandom(16)
+    data = app._pkcs7_pad(b"compatibility check password")
+    outputs = {name: cls(key).apply_keystream(iv, data) for name, cls in app.AES_BACKENDS.items()}
+    if len(set(outputs.values())) != 1:
+        raise SystemExit(f"Backends disagree: {sorted(outputs)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=5000, help="number of passwords")
+    args = parser.parse_args()
+
+    app.conf.VERSION = 1
+    secret = "benchmark-user" + "deadbeef"
+    passwords = [f"password-{i:06d}" for i in range(args.hosts)]
+    check_compatible(secret)
+
+    default = app.AES_BACKEND
+    print(f"{args.hosts} passwords, default backend: {default.name}")
+    print(f"{'backend':<14}{'mode':<14}{'encrypt (s)':>12}{'decrypt (s)':>12}")
+    try:
+        for name, backend in app.AES_BACKENDS.items():
+            for cached in (False, True):
+                encrypt_time, decrypt_time = bench_backend(backend, passwords, secret, cached)
+                label = "cached" if cached else "uncached"
+                print(f"{name:<14}{label:<14}{encrypt_time:>12.3f}{decrypt_time:>12.3f}")
+            encrypt_time, decrypt_time = bench_backend_bulk(backend, passwords, secret)
+            print(f"{name:<14}{'bulk':<14}{encrypt_time:>12.3f}{decrypt_time:>12.3f}")
+    finally:
+        app.AES_BACKEND = default
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Measure the memory held by the hosts loaded from the gcm.cache snapshot."""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import marshal
+import os
+import tracemalloc
+from pathlib import Path
+
+from gnome_connection_manager import app
+
+
+def make_snapshot(count: int) -> bytes:
+    hosts = []
+    for i in range(count):
+        host = app.Host(
+            group=f"region{i % 10}/site{i % 200}",
+            name=f"host{i:06d}",
+            host=f"10.{i // 65536}.{i // 256 % 256}.{i % 256}",
+            user="admin",
+            port="22",
+            commands="",
+            term="xterm-256color",
+        )
+        hosts.append((host.to_args(), ""))
+    return marshal.dumps({"hosts": hosts})
+
+
+def resident_memory() -> int:
+    pages = int(Path("/proc/self/statm").read_text().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=100000, help="inventory size")
+    args = parser.parse_args()
+
+    app.enc_passwd = "benchmark"
+    data = make_snapshot(args.hosts)
+    # the snapshot gives every host its own copy of each string, as parsing gcm.conf does
+    gc.collect()
+    rss = resident_memory()
+    hosts = app.ConfigSnapshot.load_hosts(marshal.loads(data))
+    gc.collect()
+    rss = resident_memory() - rss
+
+    # a second load, traced, for the memory the hosts keep once the snapshot is freed
+    del hosts
+    gc.collect()
+    tracemalloc.start()
+    hosts = app.ConfigSnapshot.load_hosts(marshal.loads(data))
+    gc.collect()
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    if sum(len(group) for group in hosts.values()) != args.hosts:
+        raise SystemExit("snapshot lost hosts")
+    print(f"{args.hosts} hosts")
+    print(f"{'resident (MB)':<14}{rss / 1e6:>8.1f}")
+    print(f"{'traced (MB)':<14}{traced / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Time quick connect queries against the host search index."""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from gnome_connection_manager import app
+
+QUERIES = [
+    "",
+    "h",
+    "host",
+    "host0123",
+    "hots0123",
+    "site12 host01",
+    "web serv",
+    "10.0.3.17",
+    "zzzz",
+]
+
+
+def make_hosts(count: int) -> list:
+    return [
+        app.Host(
+            group=f"region{i % 10}/site{i % 200}",
+            name=f"host{i:06d}",
+            description=f"rack {i % 40} web server",
+            host=f"10.{i // 65536}.{i // 256 % 256}.{i % 256}",
+            user="admin",
+        )
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=50000, help="inventory size")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each query")
+    args = parser.parse_args()
+
+    hosts = make_hosts(args.hosts)
+    start = time.perf_counter()
+    index = app.HostSearchIndex(hosts)
+    build = time.perf_counter() - start
+    # a few sessions opened recently
+    recent = {host: float(i) for i, host in enumerate(hosts[:: max(1, args.hosts // 20)])}
+
+    print(f"{args.hosts} hosts, index built in {build:.2f} s")
+    print(f"{'query':<16}{'results':>8}{'worst (ms)':>12}")
+    for query in QUERIES:
+        worst = 0.0
+        for _i in range(args.repeat):
+            start = time.perf_counter()
+            results = index.rank(query, app.QUICK_CONNECT_RESULTS, recent)
+            worst = max(worst, time.perf_counter() - start)
+        print(f"{query!r:<16}{len(results):>8}{worst * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
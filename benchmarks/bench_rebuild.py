@@ -0,0 +1,75 @@
+"""Time rebuilding the servers tree shown in a window."""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from gnome_connection_manager import app
+from gnome_connection_manager.app import Gtk
+
+
+def make_groups(count: int) -> dict[str, list]:
+    groups: dict[str, list] = {}
+    for i in range(count):
+        group = f"region{i % 10}/site{i % 200}"
+        host = app.Host(group, f"host{i:06d}", "", f"10.{i // 65536}.{i // 256 % 256}.{i % 256}")
+        groups.setdefault(group, []).append(host)
+    return app.HostUtils.sort_groups(groups)
+
+
+def make_wmain():
+    wmain = object.__new__(app.Wmain)
+    wmain.treeServers = Gtk.TreeView()
+    wmain.menuServers = Gtk.Menu()
+    wmain.nbConsole = None
+    wmain.expand_source = None
+    wmain.filter_text = ""
+    wmain.updating_tree = False
+    wmain.set_servers_model(wmain.new_servers_model())
+
+    column = Gtk.TreeViewColumn()
+    renderer = Gtk.CellRendererText()
+    column.pack_start(renderer, expand=True)
+    column.add_attribute(renderer, "text", 0)
+    column.set_cell_data_func(renderer, wmain.servers_cell_data)
+    wmain.treeServers.append_column(column)
+    scrolled = Gtk.ScrolledWindow()
+    scrolled.add(wmain.treeServers)
+    window = Gtk.OffscreenWindow()
+    window.add(scrolled)
+    window.set_default_size(300, 800)
+    window.show_all()
+    wmain.update_row_color()
+    return wmain
+
+
+def timed_rebuild(wmain) -> float:
+    start = time.perf_counter()
+    wmain.updateTree()
+    while Gtk.events_pending():
+        Gtk.main_iteration()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--hosts", type=int, nargs="+", default=[1000, 10000, 50000], help="inventory sizes"
+    )
+    args = parser.parse_args()
+
+    wmain = make_wmain()
+    print(f"{'hosts':>8}{'expanded (s)':>14}{'collapsed (s)':>15}")
+    for count in args.hosts:
+        app.groups = make_groups(count)
+        app.conf.COLLAPSED_FOLDERS = ""
+        expanded = timed_rebuild(wmain)
+        # collapse the top level folders: "region0", "region1", ...
+        app.conf.COLLAPSED_FOLDERS = ",".join(wmain.subfolders[""])
+        collapsed = timed_rebuild(wmain)
+        print(f"{count:>8}{expanded:>14.3f}{collapsed:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Time loading gcm.conf at startup with and without the gcm.cache snapshot."""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import types
+from pathlib import Path
+
+from gnome_connection_manager import app
+
+
+def make_groups(count: int) -> dict[str, list]:
+    groups: dict[str, list] = {}
+    for i in range(count):
+        group = f"region{i % 10}/site{i % 100}"
+        host = app.Host(group, f"host{i:06d}", "", f"10.{i // 65536}.{i // 256 % 256}.{i % 256}")
+        host.user = "admin"
+        host.password = f"password-{i}"
+        host.commands = ""
+        groups.setdefault(group, []).append(host)
+    return groups
+
+
+def make_wmain():
+    wmain = object.__new__(app.Wmain)
+    wmain.hpMain = types.SimpleNamespace(get_position=lambda: 150)
+    wmain.wMain = types.SimpleNamespace(is_maximized=lambda: False)
+    wmain.get_collapsed_nodes = lambda: []
+    wmain.journal_records = 0
+    wmain.config_writer = app.ConfigWriter()
+    wmain.config_source = None
+    wmain.config_base = {}
+    return wmain
+
+
+def timed_load(wmain) -> float:
+    start = time.perf_counter()
+    wmain.loadConfig()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--hosts", type=int, nargs="+", default=[1000, 10000, 100000], help="inventory sizes"
+    )
+    args = parser.parse_args()
+
+    app.enc_passwd = "benchmark"
+    print(f"{'hosts':>8}{'conf size':>12}{'cold (s)':>10}{'warm (s)':>10}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        app.CONFIG_FILE = str(Path(tmp) / "gcm.conf")
+        for count in args.hosts:
+            app.groups = make_groups(count)
+            wmain = make_wmain()
+            wmain.writeConfig()
+            wmain.config_writer.flush()
+            size = Path(app.CONFIG_FILE).stat().st_size
+
+            app.ConfigSnapshot.path().unlink()
+            cold = timed_load(wmain)
+            warm = timed_load(wmain)
+            if sum(len(hosts) for hosts in app.groups.values()) != count:
+                raise SystemExit("warm load lost hosts")
+            print(f"{count:>8}{size / 1e6:>10.1f}MB{cold:>10.3f}{warm:>10.3f}{cold / warm:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Time setting up the font and colors of new tabs, parsed per tab or shared."""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from gnome_connection_manager import app
+
+
+def timed_styles(count: int, shared: bool) -> float:
+    styles = []
+    start = time.perf_counter()
+    for _i in range(count):
+        if not shared:
+            # what every tab paid before the styles were cached
+            app.clear_terminal_styles()
+        styles.append(app.get_terminal_style("monospace 11", "#C0C0C0", "#000000", 10))
+    return (time.perf_counter() - start) / count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tabs", type=int, default=100, help="tabs opened per run")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each mode")
+    args = parser.parse_args()
+
+    parsed = min(timed_styles(args.tabs, shared=False) for _i in range(args.repeat))
+    cached = min(timed_styles(args.tabs, shared=True) for _i in range(args.repeat))
+
+    print(f"{'styles':<10}{'per tab (us)':>14}")
+    print(f"{'parsed':<10}{parsed * 1e6:>14.1f}")
+    print(f"{'shared':<10}{cached * 1e6:>14.1f}")
+    print(f"speedup {parsed / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Time building the servers tree and menu for deeply nested groups."""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from gnome_connection_manager import app
+from gnome_connection_manager.app import GLib, GObject, Gtk
+
+FILTER_QUERIES = ["h", "ho", "host001", "rack1999"]
+
+
+def make_groups(count: int, hosts_per_group: int) -> dict[str, list]:
+    groups: dict[str, list] = {}
+    for i in range(count):
+        group = f"region{i % 5}/zone{i % 50}/site{i % 500}/rack{i}"
+        groups[group] = [
+            app.Host(group, f"host{j:03d}", "", f"10.{i // 256}.{i % 256}.{j}")
+            for j in range(hosts_per_group)
+        ]
+    return groups
+
+
+def make_wmain():
+    wmain = object.__new__(app.Wmain)
+    wmain.treeModel = Gtk.TreeStore(GObject.TYPE_STRING, GObject.TYPE_PYOBJECT, str)
+    wmain.treeServers = Gtk.TreeView(model=wmain.treeModel)
+    wmain.menuServers = Gtk.Menu()
+    wmain.nbConsole = None
+    wmain.unfilled_folders = set()
+    wmain.expand_source = None
+    wmain.filter_text = ""
+    wmain.filter_matches = None
+    wmain.filter_refresh_source = None
+    wmain.collapsed_before_filter = []
+    wmain.host_index = None
+    wmain.index_source = None
+    wmain.visible_rows = None
+    wmain.updating_tree = False
+    wmain.get_collapsed_nodes = lambda: []
+    app.conf.COLLAPSED_FOLDERS = ""
+    app.inventory.subscribe(wmain.on_inventory_changed)
+    return wmain
+
+
+def timed_filter(wmain, text: str) -> tuple[float, float]:
+    """Return the time filter_hosts blocks the main loop and the time until every match is shown."""
+    start = time.perf_counter()
+    wmain.filter_hosts(text)
+    keystroke = time.perf_counter() - start
+    context = GLib.MainContext.default()
+    while wmain.expand_source is not None:
+        context.iteration(False)
+    return keystroke, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, default=2000, help="number of nested groups")
+    parser.add_argument("--hosts", type=int, default=5, help="hosts per group")
+    args = parser.parse_args()
+
+    app.groups = make_groups(args.groups, args.hosts)
+    wmain = make_wmain()
+
+    start = time.perf_counter()
+    wmain.updateTree()
+    build = time.perf_counter() - start
+    if len(wmain.menuServers.get_children()) != len(wmain.subfolders[""]):
+        raise SystemExit("servers menu is missing folders")
+
+    host = app.groups[sorted(app.groups)[args.groups // 2]][0]
+    edited = host.clone()
+    edited.group = host.group.rpartition("/")[0] + "/moved"
+    start = time.perf_counter()
+    app.inventory.replace(host, edited)
+    move = time.perf_counter() - start
+
+    print(f"{args.groups} groups, {len(wmain.folder_iters)} folders, {args.hosts} hosts per group")
+    print(f"{'updateTree (s)':<18}{build:>10.3f}")
+    print(f"{'move one host (s)':<18}{move:>10.3f}")
+
+    wmain.get_host_index()
+    print(f"{'filter':<18}{'keystroke (s)':>14}{'shown (s)':>10}")
+    for query in FILTER_QUERIES:
+        keystroke, shown = timed_filter(wmain, query)
+        wmain.clear_host_filter()
+        print(f"{query!r:<18}{keystroke:>14.3f}{shown:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
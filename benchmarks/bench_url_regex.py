@@ -0,0 +1,43 @@
+"""Time creating terminals with their URL regexes, compiled per terminal or shared."""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from gnome_connection_manager import app
+from gnome_connection_manager.app import Vte
+
+
+def timed_terminals(wmain, count: int, shared: bool) -> float:
+    terminals = []
+    start = time.perf_counter()
+    for _i in range(count):
+        if not shared:
+            # what every tab paid before the regexes were cached
+            app._url_regexes.clear()
+        terminal = Vte.Terminal()
+        wmain.registerUrlRegexes(terminal)
+        terminals.append(terminal)
+    return (time.perf_counter() - start) / count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tabs", type=int, default=200, help="terminals created per run")
+    args = parser.parse_args()
+
+    wmain = object.__new__(app.Wmain)
+    uncached = timed_terminals(wmain, args.tabs, shared=False)
+    cached = timed_terminals(wmain, args.tabs, shared=True)
+    if app.get_url_regex(app.urlregex.URL) is None:
+        print("PCRE2 regexes are not available, only the failure is cached")
+
+    print(f"{'regexes':<10}{'per tab (ms)':>14}")
+    print(f"{'compiled':<10}{uncached * 1000:>14.3f}")
+    print(f"{'shared':<10}{cached * 1000:>14.3f}")
+    print(f"speedup {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -40,21 +40,31 @@
 
 import base64
 import builtins
+import collections
 import configparser
 import contextlib
+import fcntl
+import fnmatch
 import hashlib
+import heapq
+import io
+import itertools
+import json
 import logging
+import marshal
 import operator
 import os
 import re
 import shlex
+import sqlite3
 import sys
 import tempfile
 import time
 import tokenize
 import weakref
 from pathlib import Path
-from threading import Thread
+from threading import Condition, Event, Thread, local
+from urllib.parse import quote, unquote
 
 
 def _configure_logging():
@@ -97,6 +107,12 @@ def bindtextdomain(app_name, locale_dir=None):
 
 import pyaes
 
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:
+    # Optional: pyaes is used for password encryption when cryptography is missing
+    Cipher = algorithms = modes = None
+
 from gnome_connection_manager.utils import urlregex
 
 # check Terminal version
@@ -163,6 +179,20 @@ assert Path(USERHOME_DIR).is_dir(), (
 CONFIG_DIR = USERHOME_DIR + "/.gcm"
 CONFIG_FILE = CONFIG_DIR + "/gcm.conf"
 KEY_FILE = CONFIG_DIR + "/.gcm.key"
+# gcm.conf is rewritten in full once the journal holds this many changes
+JOURNAL_COMPACT_RECORDS = 200
+# where the host list is kept (conf.HOSTS_STORAGE)
+HOSTS_STORAGE_INI = 0
+HOSTS_STORAGE_SQLITE = 1
+HOSTS_STORAGE_GROUP_FILES = 2
+# folders filled and expanded per idle callback by "expand all"
+EXPAND_FOLDERS_STEP = 50
+# hosts added to the search index per idle callback after loading the config
+INDEX_HOSTS_STEP = 2000
+# rows shown by the quick connect palette
+QUICK_CONNECT_RESULTS = 50
+# words whose rarest trigrams are shared by more hosts are not searched for typos
+FUZZY_CANDIDATES = 5000
 
 if not Path(CONFIG_DIR).exists():
     Path(CONFIG_DIR).mkdir(parents=True)
@@ -172,6 +202,25 @@ domain_name = "gcm-lang"
 # these colors are defined in vte sourcecode, but there is no way to read them (vte.cc 0.60.1, line 2371)
 DEFAULT_BGCOLOR = "#000000"
 DEFAULT_FGCOLOR = "#C0C0C0"
+# terminal palette: the 8 normal colors, then the 8 bright ones
+TERMINAL_PALETTE = (
+    "#000000",
+    "#CC0000",
+    "#4E9A06",
+    "#C4A000",
+    "#3465A4",
+    "#75507B",
+    "#06989A",
+    "#D3D7CF",
+    "#555753",
+    "#EF2929",
+    "#8AE234",
+    "#FCE94F",
+    "#729FCF",
+    "#729FCF",
+    "#34E2E2",
+    "#EEEEEC",
+)
 
 HSPLIT = 0
 VSPLIT = 1
@@ -229,6 +278,11 @@ shortcuts = {}
 enc_passwd = ""
 
 
+def is_group_loaded(grupo):
+    """False while the hosts of grupo are still in its file, see LazyGroups."""
+    return not isinstance(groups, LazyGroups) or groups.is_loaded(grupo)
+
+
 class GladeComponent:
     def __init__(self, path, root=None, domain=None, application=None, parent=None, **kwargs):
         self.builder = Gtk.Builder()
@@ -325,6 +379,8 @@ class conf:
     VERSION = 0
     UPDATE_TITLE = 0
     APP_TITLE = app_name
+    JOURNAL = False
+    HOSTS_STORAGE = HOSTS_STORAGE_INI
 
 
 def msgbox(text: str, parent: Gtk.Window | None = None) -> None:
@@ -458,6 +514,41 @@ def color_to_hex(rgba: Gdk.RGBA, diff: int = 0) -> str:
     return f"#{int(rgba.red * 255 + diff):x}{int(rgba.green * 255 + diff):x}{int(rgba.blue * 255 + diff):x}"
 
 
+class TerminalStyle:
+    """Font and colors of the terminals opened with the same settings, shared and never modified."""
+
+    __slots__ = ("font", "foreground", "background", "palette", "transparent_background")
+
+    def __init__(self, font, fcolor, bcolor, transparency):
+        self.font = Pango.FontDescription(font)
+        self.palette = [parse_color_rgba(spec) for spec in TERMINAL_PALETTE]
+        # sin colores se usan los de VTE
+        self.foreground = parse_color_rgba(fcolor) if fcolor and bcolor else None
+        self.background = parse_color_rgba(bcolor) if fcolor and bcolor else None
+        self.transparent_background = None
+        if transparency > 0:
+            # if bcolor is not set, then use default background color
+            self.transparent_background = parse_color_rgba(bcolor if bcolor else DEFAULT_BGCOLOR)
+            self.transparent_background.alpha = 1 - (transparency / 100)
+
+
+# TerminalStyle por (fuente, color de letra, color de fondo, transparencia)
+_terminal_styles = {}
+
+
+def get_terminal_style(font, fcolor, bcolor, transparency):
+    key = (font, fcolor, bcolor, transparency)
+    style = _terminal_styles.get(key)
+    if style is None:
+        style = _terminal_styles[key] = TerminalStyle(*key)
+    return style
+
+
+def clear_terminal_styles():
+    """Forget the terminal styles, after the settings or a host changed their font or colors."""
+    _terminal_styles.clear()
+
+
 def get_key_name(event):
     name = ""
     if event.state & Gdk.ModifierType.CONTROL_MASK:
@@ -575,25 +666,130 @@ def _iter_blocks(data: bytes, size: int = 16):
         yield data[i : i + size]
 
 
-def _generate_keystream(key: bytes, iv: bytes):
-    ecb = pyaes.AESModeOfOperationECB(key)
+def _generate_keystream(ecb: pyaes.AESModeOfOperationECB, iv: bytes):
     stream = iv
     while True:
         stream = ecb.encrypt(stream)
         yield stream
 
 
+def _xor_bytes(data: bytes, keystream: bytes) -> bytes:
+    """XOR data with the start of keystream as two big integers."""
+    size = len(data)
+    value = int.from_bytes(data, "big") ^ int.from_bytes(keystream[:size], "big")
+    return value.to_bytes(size, "big")
+
+
+class PyaesCipher:
+    """Pure-python AES keystream, always available but slow."""
+
+    name = "pyaes"
+
+    def __init__(self, key: bytes):
+        self.ecb = pyaes.AESModeOfOperationECB(key)
+
+    def apply_keystream(self, iv: bytes, data: bytes) -> bytes:
+        keystream = _generate_keystream(self.ecb, iv)
+        stream = b"".join(next(keystream) for _ in range(0, len(data), 16))
+        return _xor_bytes(data, stream)
+
+    def apply_keystreams(self, ivs: list[bytes], datas: list[bytes]) -> list[bytes]:
+        return [self.apply_keystream(iv, data) for iv, data in zip(ivs, datas)]
+
+
+class CryptographyCipher:
+    """OpenSSL backed AES keystream from the cryptography package.
+
+    The keystream E(iv), E(E(iv)), ... used by gcm.conf is exactly AES-OFB,
+    so the output is byte-for-byte the same as PyaesCipher.
+    """
+
+    name = "cryptography"
+
+    def __init__(self, key: bytes):
+        self.algorithm = algorithms.AES(key)
+
+    def apply_keystream(self, iv: bytes, data: bytes) -> bytes:
+        cipher = Cipher(self.algorithm, modes.OFB(iv)).encryptor()
+        return cipher.update(data) + cipher.finalize()
+
+    def apply_keystreams(self, ivs: list[bytes], datas: list[bytes]) -> list[bytes]:
+        """Apply the keystream of many ivs at once.
+
+        Block n of every keystream is computed in a single ECB call over the
+        concatenated block n-1 of all the values that are still that long.
+        """
+        streams = [bytearray() for _ in datas]
+        active = list(range(len(datas)))
+        states = b"".join(ivs)
+        while active:
+            states = Cipher(self.algorithm, modes.ECB()).encryptor().update(states)
+            still_active = []
+            next_states = []
+            for index, block in zip(active, _iter_blocks(states)):
+                streams[index] += block
+                if len(streams[index]) < len(datas[index]):
+                    still_active.append(index)
+                    next_states.append(block)
+            active = still_active
+            states = b"".join(next_states)
+        return [_xor_bytes(data, stream) for data, stream in zip(datas, streams)]
+
+
+AES_BACKENDS = {PyaesCipher.name: PyaesCipher}
+if Cipher is not None:
+    AES_BACKENDS[CryptographyCipher.name] = CryptographyCipher
+
+
+def _select_aes_backend():
+    requested = os.getenv("GCM_AES_BACKEND", "").lower()
+    if requested:
+        if requested in AES_BACKENDS:
+            return AES_BACKENDS[requested]
+        logger.warning("AES backend %s not available, falling back", requested)
+    return AES_BACKENDS.get(CryptographyCipher.name, PyaesCipher)
+
+
+AES_BACKEND = _select_aes_backend()
+
+# Ciphers kept while a cipher_cache() block is active, per thread
+_cipher_cache = local()
+
+
+@contextlib.contextmanager
+def cipher_cache():
+    """Derive the key and set up the cipher once per password inside the block.
+
+    Meant to wrap a whole load or save of the host list, where every host is
+    encrypted with the same password. Nested blocks share the outer cache.
+    """
+    if getattr(_cipher_cache, "ciphers", None) is not None:
+        yield
+        return
+    _cipher_cache.ciphers = {}
+    try:
+        yield
+    finally:
+        _cipher_cache.ciphers = None
+
+
+def _get_cipher(passw: str):
+    ciphers = getattr(_cipher_cache, "ciphers", None)
+    if ciphers is None:
+        return AES_BACKEND(_password_to_key(passw))
+    cache_key = (AES_BACKEND, passw)
+    cipher = ciphers.get(cache_key)
+    if cipher is None:
+        cipher = ciphers[cache_key] = AES_BACKEND(_password_to_key(passw))
+    return cipher
+
+
 def encrypt(passw: str, string: str) -> str:
     """Encrypt a string using AES."""
     try:
-        key = _password_to_key(passw)
         iv = os.urandom(16)
         plaintext = _pkcs7_pad(string.encode("utf-8"))
-        keystream = _generate_keystream(key, iv)
-        ciphertext = bytearray()
-        for block in _iter_blocks(plaintext):
-            stream_block = next(keystream)
-            ciphertext.extend(bytes(b ^ s for b, s in zip(block, stream_block)))
+        ciphertext = _get_cipher(passw).apply_keystream(iv, plaintext)
         return base64.b64encode(iv + ciphertext).decode("ascii")
     except Exception:
         logger.exception("AES encryption error")
@@ -609,18 +805,67 @@ def decrypt(passw: str, string: str) -> str:
         if len(data) <= 16:
             return ""
         iv, ciphertext = data[:16], data[16:]
-        key = _password_to_key(passw)
-        keystream = _generate_keystream(key, iv)
-        plaintext = bytearray()
-        for block in _iter_blocks(ciphertext):
-            stream_block = next(keystream)
-            plaintext.extend(bytes(b ^ s for b, s in zip(block, stream_block)))
-        return _pkcs7_unpad(bytes(plaintext)).decode("utf-8")
+        plaintext = _get_cipher(passw).apply_keystream(iv, ciphertext)
+        return _pkcs7_unpad(plaintext).decode("utf-8")
     except Exception:
         logger.exception("AES decryption error")
         return ""
 
 
+def encrypt_many(passw: str, strings: list[str]) -> list[str]:
+    """Encrypt a list of strings with the same password in one batch."""
+    try:
+        randomness = os.urandom(16 * len(strings))
+        ivs = list(_iter_blocks(randomness))
+        plaintexts = [_pkcs7_pad(string.encode("utf-8")) for string in strings]
+        ciphertexts = _get_cipher(passw).apply_keystreams(ivs, plaintexts)
+        return [
+            base64.b64encode(iv + ciphertext).decode("ascii")
+            for iv, ciphertext in zip(ivs, ciphertexts)
+        ]
+    except Exception:
+        # let encrypt() report the values that can not be encrypted
+        logger.debug("Batch encryption failed, encrypting one by one", exc_info=True)
+        return [encrypt(passw, string) for string in strings]
+
+
+def decrypt_many(passw: str, strings: list[str]) -> list[str]:
+    """Decrypt a list of strings encrypted with the same password in one batch."""
+    if conf.VERSION == 0:
+        return [decrypt(passw, string) for string in strings]
+    try:
+        datas = [base64.b64decode(string) for string in strings]
+        valid = [i for i, data in enumerate(datas) if len(data) > 16]
+        plaintexts = _get_cipher(passw).apply_keystreams(
+            [datas[i][:16] for i in valid], [datas[i][16:] for i in valid]
+        )
+        result = [""] * len(strings)
+        for i, plaintext in zip(valid, plaintexts):
+            result[i] = _pkcs7_unpad(plaintext).decode("utf-8")
+        return result
+    except Exception:
+        logger.debug("Batch decryption failed, decrypting one by one", exc_info=True)
+        return [decrypt(passw, string) for string in strings]
+
+
+# Vte.Regex de cada patron de urlregex, None si no se pudo compilar
+_url_regexes = {}
+
+
+def get_url_regex(pattern):
+    """Return the Vte.Regex for pattern, compiled once per process; None if it cannot be compiled."""
+    if pattern not in _url_regexes:
+        try:
+            _url_regexes[pattern] = Vte.Regex.new_for_match(
+                pattern, len(pattern), urlregex.PCRE2_FLAGS
+            )
+        except Exception:
+            # sin soporte para pcre2 no se vuelve a intentar en cada terminal
+            logger.warning("Cannot compile URL regex, links are not highlighted", exc_info=True)
+            _url_regexes[pattern] = None
+    return _url_regexes[pattern]
+
+
 def vte_feed(terminal, data):
     if TERMINAL_V048 or (Vte.MAJOR_VERSION, Vte.MINOR_VERSION) >= (0, 42):
         try:
@@ -711,6 +956,7 @@ class Wmain(GladeComponent):
 
         global wMain
         wMain = self
+        self.config_writer = ConfigWriter()
 
         load_encryption_key()
 
@@ -725,6 +971,7 @@ class Wmain(GladeComponent):
         self._context_terminal = None
         self._context_tab_widget = None
         self._context_tree_path = None
+        self.background_task = None
 
         if conf.VERSION == 0:
             initialise_encyption_key()
@@ -785,18 +1032,16 @@ class Wmain(GladeComponent):
             self.addTab(self.nbConsole, "local")
 
     def open_cli_targets(self, args):
+        """Open a tab for each host given as "group/name", address or glob pattern of either."""
         for arg in args:
-            i = arg.rfind("/")
-            if i == -1:
-                continue
-            group = arg[:i]
-            name = arg[i + 1 :]
-            if not group or not name or group not in groups:
-                continue
-            for host in groups[group]:
-                if host.name == name:
-                    self.addTab(self.nbConsole, host)
-                    break
+            if any(c in arg for c in "*?["):
+                hosts = inventory.match(arg)
+            else:
+                group, _sep, name = arg.rpartition("/")
+                host = inventory.find(group, name) if group and name else None
+                hosts = [host] if host is not None else inventory.find_address(arg)
+            for host in hosts:
+                self.addTab(self.nbConsole, host)
 
     def update_visual(self):
         window = self.get_widget("wMain")
@@ -1159,36 +1404,28 @@ class Wmain(GladeComponent):
             self.show_save_buffer(self.popupMenu.terminal)
             return True
         elif item == "H":  # COPY HOST ADDRESS TO CLIPBOARD
-            if self.treeServers.get_selection().get_selected()[
-                1
-            ] is not None and not self.treeModel.iter_has_child(
-                self.treeServers.get_selection().get_selected()[1]
+            if self.get_selected_iter() is not None and not self.treeModel.iter_has_child(
+                self.get_selected_iter()
             ):
-                host = self.treeModel.get_value(
-                    self.treeServers.get_selection().get_selected()[1], 1
-                )
+                host = self.treeModel.get_value(self.get_selected_iter(), 1)
                 cb = Gtk.Clipboard.get_default(Gdk.Display.get_default())
                 cb.set_text(host.host, len(host.host))
                 cb.store()
             return True
         elif item == "D":  # DUPLICATE HOST
-            if self.treeServers.get_selection().get_selected()[
-                1
-            ] is not None and not self.treeModel.iter_has_child(
-                self.treeServers.get_selection().get_selected()[1]
+            if self.get_selected_iter() is not None and not self.treeModel.iter_has_child(
+                self.get_selected_iter()
             ):
-                selected = self.treeServers.get_selection().get_selected()[1]
+                selected = self.get_selected_iter()
                 group = self.get_group(selected)
                 host = self.treeModel.get_value(selected, 1)
                 newname = f"{host.name} (copy)"
                 newhost = host.clone()
-                for h in groups[group]:
-                    if h.name == newname:
-                        newname = f"{newname} (copy)"
+                while inventory.find(group, newname) is not None:
+                    newname = f"{newname} (copy)"
                 newhost.name = newname
-                groups[group].append(newhost)
-                self.updateTree()
-                self.writeConfig()
+                inventory.add(newhost)
+                self.save_host(newhost)
             return True
         elif item == "R":  # RENAME TAB
             text = inputbox(
@@ -1587,8 +1824,10 @@ class Wmain(GladeComponent):
         terminal.tag_email = self.registerUrlRegex(terminal, urlregex.EMAIL)
 
     def registerUrlRegex(self, terminal, regex):
+        new_reg_m = get_url_regex(regex)
+        if new_reg_m is None:
+            return None
         try:
-            new_reg_m = Vte.Regex.new_for_match(regex, len(regex), urlregex.PCRE2_FLAGS)
             tag = terminal.match_add_regex(new_reg_m, 0)
             terminal.match_set_cursor_name(tag, "pointer")
             return tag
@@ -1605,13 +1844,16 @@ class Wmain(GladeComponent):
             self.registerUrlRegexes(v)
 
             if isinstance(host, str):
-                host = Host("", host)
+                host = Host(group="", name=host)
                 # Note: log enablement defaults to host.log except for 'local'
                 # sessions that do not have a saved session to seed the host
                 # configuration, but rather use a global GCM config toggle
                 if host.name == "local":
                     # print ("D: Local session logging set to: %s\n" % (conf.LOG_LOCAL))
                     host.log = conf.LOG_LOCAL
+            else:
+                # para ordenar la conexion rapida
+                self.recent_hosts[(host.group, host.name)] = time.monotonic()
 
             fcolor = host.font_color
             bcolor = host.back_color
@@ -1619,38 +1861,13 @@ class Wmain(GladeComponent):
                 fcolor = conf.FONT_COLOR
                 bcolor = conf.BACK_COLOR
 
-            palette_components = [
-                # background
-                "#000000",
-                "#CC0000",
-                "#4E9A06",
-                "#C4A000",
-                "#3465A4",
-                "#75507B",
-                "#06989A",
-                "#D3D7CF",
-                # foreground
-                "#555753",
-                "#EF2929",
-                "#8AE234",
-                "#FCE94F",
-                "#729FCF",
-                "#729FCF",
-                "#34E2E2",
-                "#EEEEEC",
-            ]
-
-            palette = []
-            for components in palette_components:
-                color = parse_color_rgba(components)
-                palette.append(color)
-
-            if len(fcolor) > 0 and len(bcolor) > 0:
-                v.set_colors(parse_color_rgba(fcolor), parse_color_rgba(bcolor), palette)
-
             if len(conf.FONT) == 0:
                 conf.FONT = "monospace"
-            v.set_font(Pango.FontDescription(conf.FONT))
+            # la misma fuente y colores para todas las terminales con la misma configuracion
+            style = get_terminal_style(conf.FONT, fcolor, bcolor, conf.TRANSPARENCY)
+            if style.foreground is not None:
+                v.set_colors(style.foreground, style.background, style.palette)
+            v.set_font(style.font)
 
             scrollPane = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
             scrollbar = Gtk.Scrollbar().new(Gtk.Orientation.VERTICAL, v.get_vadjustment())
@@ -1667,14 +1884,10 @@ class Wmain(GladeComponent):
             v.connect("key_press_event", self.on_terminal_keypress)
             v.connect("selection-changed", self.on_terminal_selection)
 
-            if conf.TRANSPARENCY > 0 and self.wMain.transparency:
+            if style.transparent_background is not None and self.wMain.transparency:
                 # v.set_opacity(1 - (conf.TRANSPARENCY / 100)) #posibly a bug in gtk3, set_opacity only works if parent is transparent too (worked just fine in gtk2),
                 # the workaround is to set the background color with alpha channel
-
-                # if bcolor is not set, then use default background color
-                c = parse_color_rgba(bcolor if bcolor else DEFAULT_BGCOLOR)
-                c.alpha = 1 - (conf.TRANSPARENCY / 100)
-                v.set_color_background(c)
+                v.set_color_background(style.transparent_background)
 
             v.set_backspace_binding(host.backspace_key)
             v.set_delete_binding(host.delete_key)
@@ -1786,8 +1999,7 @@ class Wmain(GladeComponent):
     def initLeftPane(self):
         global groups
 
-        self.treeModel = Gtk.TreeStore(GObject.TYPE_STRING, GObject.TYPE_PYOBJECT, str, str)
-        self.treeServers.set_model(self.treeModel)
+        self.set_servers_model(self.new_servers_model())
 
         self.treeServers.set_level_indentation(5)
         # self.treeServers.set_grid_lines(Gtk.TreeViewGridLines.HORIZONTAL)
@@ -1799,18 +2011,41 @@ class Wmain(GladeComponent):
         renderer = Gtk.CellRendererPixbuf()
         column.pack_start(renderer, expand=False)
         column.add_attribute(renderer, "stock_id", 2)
-        column.add_attribute(renderer, "cell-background", 3)
+        column.set_cell_data_func(renderer, self.servers_cell_data)
 
         renderer = Gtk.CellRendererText()
         column.pack_start(renderer, expand=True)
         column.add_attribute(renderer, "text", 0)
-        column.add_attribute(renderer, "cell-background", 3)
+        column.set_cell_data_func(renderer, self.servers_cell_data)
 
         self.treeServers.set_has_tooltip(True)
         self.treeServers.connect("query-tooltip", self.on_treeServers_tooltip)
         self.treeServers.connect("key-press-event", self.on_treeServers_key_press)
+        self.treeServers.connect("row-expanded", self.on_tvServers_row_expanded)
+        inventory.subscribe(self.on_inventory_changed)
+        self.folder_iters = {}
+        self.folder_menus = {}
+        self.subfolders = {}
+        self.unfilled_folders = set()
+        self.expand_source = None
+        self.updating_tree = False
+        # filtro de hosts y conexion rapida, ver filter_hosts y quick_connect_hosts
+        self.host_index = None
+        self.index_pending = collections.deque()
+        self.index_unloaded = set()
+        self.index_source = None
+        self.recent_hosts = {}
+        self.filter_text = ""
+        self.filter_matches = None
+        self.filter_folders = set()
+        self.filter_refresh_source = None
+        self.treeFilter = None
+        self.collapsed_before_filter = []
+        self.update_row_color()
         self.loadConfig()
+        self.index_hosts()
         self.updateTree()
+        self.watch_config()
 
     def on_treeServers_key_press(self, widget, event, *args):
         if event.keyval == Gdk.KEY_Delete:
@@ -1838,8 +2073,17 @@ class Wmain(GladeComponent):
     def loadConfig(self):
         global groups
 
+        source = ConfigSnapshot.source_key()
+        self.config_source = source
+        snapshot = ConfigSnapshot.load(source)
         cp = configparser.RawConfigParser()
-        cp.read(CONFIG_FILE)
+        if snapshot is not None:
+            cp.read_dict(snapshot["settings"])
+            self.journal_records = snapshot["journal_records"]
+        else:
+            cp.read(CONFIG_FILE)
+            # cambios guardados despues de la ultima escritura completa
+            self.journal_records = ConfigJournal.replay(cp)
 
         # Leer configuracion general
         try:
@@ -1872,6 +2116,8 @@ class Wmain(GladeComponent):
             conf.TERM = cp.get("options", "term")
             conf.UPDATE_TITLE = cp.getboolean("options", "update-title")
             conf.APP_TITLE = cp.get("options", "app-title") or app_name
+            conf.JOURNAL = cp.getboolean("options", "journal", fallback=conf.JOURNAL)
+            conf.HOSTS_STORAGE = cp.getint("options", "hosts-storage", fallback=conf.HOSTS_STORAGE)
         except (configparser.Error, ValueError) as e:
             logger.error("%s: %s", _("Entrada invalida en archivo de configuracion"), e)
 
@@ -1913,150 +2159,670 @@ class Wmain(GladeComponent):
         shortcuts = scuts
 
         # Leer lista de hosts
-        groups = {}
-        for section in cp.sections():
-            if not section.startswith("host "):
-                continue
-            host = cp.options(section)
+        if snapshot is not None:
+            groups = ConfigSnapshot.load_hosts(snapshot)
+        else:
+            groups = HostUtils.load_hosts_from_ini(cp)
+
+            # las claves antiguas se reemplazan al iniciar, no vale la pena guardar nada
+            if conf.VERSION != 0:
+                pwd = get_password()
+                ConfigSnapshot.save(
+                    source,
+                    cp,
+                    [
+                        (host.to_args(), host.get_encrypted_password(pwd))
+                        for grupo in groups
+                        for host in groups[grupo]
+                    ],
+                    self.journal_records,
+                )
+
+        store = self.get_host_store()
+        if store is not None:
             try:
-                host = HostUtils.load_host_from_ini(cp, section)
+                if store.exists():
+                    groups = store.load()
+                else:
+                    # primer uso: los hosts de gcm.conf pasan a la base de datos
+                    store.save_all(groups)
+            except (sqlite3.Error, OSError) as e:
+                logger.error("%s %s: %s", _("No se puede leer"), store.path, e)
+        # hosts de gcm.conf tal como estan en disco, para mezclar cambios de otras instancias
+        self.config_base = self.current_hosts() if store is None else {}
 
-                if host.group not in groups:
-                    groups[host.group] = []
+    def current_hosts(self):
+        return {(host.group, host.name): host for grupo in groups for host in groups[grupo]}
 
-                groups[host.group].append(host)
-            except (configparser.Error, ValueError, AttributeError) as e:
-                logger.error("%s: %s", _("Entrada invalida en archivo de configuracion"), e)
+    def get_collapsed_nodes(self):
+        """Return the group paths ("grupo/subgrupo") of the collapsed folders."""
+        if self.filter_text:
+            # el filtro expande todo, se guarda como estaba antes
+            return list(self.collapsed_before_filter)
+        return sorted(
+            path[1:]
+            for path, row in self.folder_iters.items()
+            if path in self.unfilled_folders
+            or not self.treeServers.row_expanded(self.treeModel.get_path(row))
+        )
 
-    def is_node_collapsed(self, model, path, iter, nodes):
-        if self.treeModel.get_value(iter, 1) is None and not self.treeServers.row_expanded(path):
-            nodes.append(self.treeModel.get_string_from_iter(iter))
+    def set_collapsed_nodes(self, collapsed=()):
+        # las carpetas cerradas no tienen filas, solo "Cargando...", el resto se expande
+        # folder_iters tiene cada carpeta despues de su padre, que ya queda expandido
+        self.updating_tree = True
+        for path, row in self.folder_iters.items():
+            if path not in self.unfilled_folders and path[1:] not in collapsed:
+                self.treeServers.expand_row(self.treeModel.get_path(row), False)
+        self.updating_tree = False
 
-    def get_collapsed_nodes(self):
-        nodes = []
-        self.treeModel.foreach(self.is_node_collapsed, nodes)
-        return nodes
-
-    def set_collapsed_nodes(self):
-        self.treeServers.expand_all()
-        if self.treeModel.get_iter_first():
-            for node in conf.COLLAPSED_FOLDERS.split(","):
-                if node != "":
-                    self.treeServers.collapse_row(Gtk.TreePath.new_from_string(node))
-
-    def servers_background_color(self):
-        self.color_index += 1
+    def servers_background_color(self, index):
         unevenColor = self.color_back1 if conf.DISABLE_HOSTS_STRIPES else self.color_back2
-        return self.color_back1 if self.color_index % 2 else unevenColor
+        return unevenColor if index % 2 else self.color_back1
+
+    def servers_cell_data(self, column, cell, model, iter, data=None):
+        # el color depende de la posicion de la fila entre las visibles
+        if self.visible_rows is None:
+            self.visible_rows = {}
+            self.index_visible_rows(None)
+        index = self.visible_rows.get(model.get_string_from_iter(iter), 0)
+        cell.set_property("cell-background-rgba", self.servers_background_color(index))
+
+    def index_visible_rows(self, parent):
+        # las filas de la vista, que puede mostrar el filtro de hosts
+        model = self.treeServers.get_model()
+        i = model.iter_children(parent)
+        while i is not None:
+            path = model.get_path(i)
+            self.visible_rows[path.to_string()] = len(self.visible_rows)
+            if self.treeServers.row_expanded(path):
+                self.index_visible_rows(i)
+            i = model.iter_next(i)
+
+    def invalidate_row_stripes(self, *args):
+        """Forget the visible rows, after rows were added, removed, expanded or collapsed."""
+        self.visible_rows = None
 
     def updateTree(self):
         for grupo in dict(groups):
-            if len(groups[grupo]) == 0:
+            if is_group_loaded(grupo) and len(groups[grupo]) == 0:
                 del groups[grupo]
 
         if conf.COLLAPSED_FOLDERS is None:
             conf.COLLAPSED_FOLDERS = ",".join(self.get_collapsed_nodes())
 
+        self.cancel_expand_all()
         self.menuServers.foreach(self.menuServers.remove)
-        self.treeModel.clear()
-
-        iconHost = "gtk-network"
-        iconDir = "gtk-directory"
-        grupos = groups.keys()
-        # grupos.sort(lambda x,y: cmp(y,x))
-        grupos = sorted(grupos, reverse=True)
+        # las filas se cargan en un modelo nuevo, sin la vista que procesaria cada insercion
+        self.treeModel = self.new_servers_model()
+        self.treeFilter = None
+        # carpeta ("/grupo/subgrupo") -> fila del arbol, submenu ya armado y subcarpetas
+        self.folder_iters = {}
+        self.folder_menus = {}
+        self.subfolders = {}
+        self.unfilled_folders = set()
 
-        for grupo in grupos:
-            group = None
+        for grupo in groups:
             path = ""
-            menuNode = self.menuServers
-
             for folder in grupo.split("/"):
+                self.subfolders.setdefault(path, set()).add(folder)
                 path = path + "/" + folder
-                row = self.get_folder(self.treeModel, "", path)
-                if row is None:
-                    group = self.treeModel.prepend(group, [folder, None, iconDir, "#fff"])
-                else:
-                    group = row.iter
-
-                menu = self.get_folder_menu(self.menuServers, "", path)
-                if menu is None:
-                    menu = Gtk.MenuItem(label=folder)
-                    menuNode.prepend(menu)
-                    menuNode = Gtk.Menu()
-                    menu.set_submenu(menuNode)
-                    menu.show()
-                else:
-                    menuNode = menu
-
-            groups[grupo].sort(key=operator.attrgetter("name"))
-            for host in groups[grupo]:
-                self.treeModel.append(group, [host.name, host, iconHost, "#fff"])
-                mnuItem = Gtk.MenuItem(label=host.name)
-                mnuItem.show()
-                mnuItem.connect(
-                    "activate", lambda arg, nb, h: self.addTab(nb, h), self.nbConsole, host
-                )
-                menuNode.append(mnuItem)
 
+        self.add_folder_rows(None, "", set(conf.COLLAPSED_FOLDERS.split(",")))
+        self.set_servers_model(self.treeModel)
+
+        # los submenus se arman la primera vez que se muestran
+        self.fill_server_menu(self.menuServers, "")
         self.set_collapsed_nodes()
         conf.COLLAPSED_FOLDERS = None
-        self.update_row_color()
+        if self.filter_text:
+            self.refilter_hosts()
 
-    def update_row_color(self, node=None):
-        # custom method to get alternating row colors in treeview, as that is not possible with gtk3
-        if not node:
-            self.color_index = 0
-            rgba = self.treeServers.get_style_context().get_property(
-                "background-color", Gtk.StateFlags.NORMAL
-            )
-            self.color_back1 = color_to_hex(rgba)
-            self.color_back2 = color_to_hex(rgba, -14)
-            i = self.treeModel.get_iter_first()
-        else:
-            i = self.treeModel.iter_children(node)
-
-        if i:
-            self.treeModel[i][3] = self.servers_background_color()
+    @staticmethod
+    def new_servers_model():
+        # nombre, host (None en las carpetas) e icono
+        return Gtk.TreeStore(GObject.TYPE_STRING, GObject.TYPE_PYOBJECT, str)
+
+    def set_servers_model(self, model):
+        """Show model in treeServers, forgetting the row stripes whenever its rows change."""
+        self.treeModel = model
+        for signal in ("row-inserted", "row-deleted", "rows-reordered"):
+            model.connect(signal, self.invalidate_row_stripes)
+        self.treeServers.set_model(model)
+        self.visible_rows = None
+
+    def add_folder_rows(self, parent, path, collapsed=None):
+        """Add the folders and hosts of path under the tree row parent.
+
+        Subfolders whose group path ("grupo/subgrupo") is in collapsed, all
+        of them if collapsed is None, and groups still in their file only get
+        a placeholder row until they are expanded.
+        """
+        iconDir = "gtk-directory"
+        for folder in sorted(self.subfolders.get(path, ())):
+            child = path + "/" + folder
+            row = self.treeModel.append(parent, [folder, None, iconDir])
+            self.folder_iters[child] = row
             if (
-                self.treeModel[i][1] is None
-                and self.treeServers.row_expanded(self.treeModel.get_path(i))
-                and self.treeModel.iter_has_child(i)
+                collapsed is None
+                or child[1:] in collapsed
+                or (child[1:] in groups and not is_group_loaded(child[1:]))
             ):
-                self.update_row_color(i)
+                self.treeModel.append(row, [_("Cargando..."), None, None])
+                self.unfilled_folders.add(child)
+            else:
+                self.add_folder_rows(row, child, collapsed)
+        if path[1:] in groups:
+            self.add_group_hosts(parent, path[1:])
+
+    def fill_folder(self, path):
+        """Replace the placeholder row of a folder with its folders and hosts."""
+        if path not in self.unfilled_folders:
+            return
+        self.unfilled_folders.discard(path)
+        row = self.folder_iters[path]
+        placeholder = self.treeModel.iter_children(row)
+        self.add_folder_rows(row, path)
+        self.treeModel.remove(placeholder)
+
+    def add_group_hosts(self, group, grupo):
+        # los hosts de cada grupo ya estan ordenados por nombre, ver HostInventory
+        iconHost = "gtk-network"
+        for host in groups[grupo]:
+            self.treeModel.append(group, [host.name, host, iconHost])
+
+    def fill_server_menu(self, menu, path):
+        """Add the folders and hosts of path to its servers submenu, once."""
+        if path in self.folder_menus:
+            return
+        self.folder_menus[path] = menu
+        for folder in sorted(self.subfolders.get(path, ())):
+            menu.append(self.create_folder_menu_item(path + "/" + folder))
+        if path[1:] in groups:
+            for host in groups[path[1:]]:
+                menu.append(self.create_host_menu_item(host))
+
+    def create_folder_menu_item(self, path):
+        mnuItem = Gtk.MenuItem(label=path.rpartition("/")[2])
+        submenu = Gtk.Menu()
+        submenu.connect("show", lambda menu, p: self.fill_server_menu(menu, p), path)
+        mnuItem.set_submenu(submenu)
+        mnuItem.show()
+        return mnuItem
+
+    def create_host_menu_item(self, host):
+        mnuItem = Gtk.MenuItem(label=host.name)
+        mnuItem.show()
+        mnuItem.connect("activate", lambda arg, nb, h: self.addTab(nb, h), self.nbConsole, host)
+        return mnuItem
+
+    def watch_config(self):
+        """Reload the hosts when another program rewrites gcm.conf."""
+        self.config_reload_id = None
+        self.config_monitor = Gio.File.new_for_path(CONFIG_FILE).monitor_file(
+            Gio.FileMonitorFlags.WATCH_MOVES, None
+        )
+        self.config_monitor.connect("changed", self.on_config_file_changed)
+
+    def on_config_file_changed(self, monitor, file, other_file, event_type):
+        # esperar a que termine de escribir, suelen llegar varios eventos seguidos
+        if self.config_reload_id is None:
+            self.config_reload_id = GLib.timeout_add(500, self.reload_config)
+
+    def reload_config(self):
+        self.config_reload_id = None
+        source = ConfigSnapshot.source_key()
+        # sin cambios, borrado o con los hosts en otro almacenamiento
+        if source[0] is None or source == self.config_source or self.get_host_store() is not None:
+            return False
+        hosts = self.config_job_hosts()
+        base, known_source = self.config_base, self.config_source
+        # una escritura pendiente ya mezcla los cambios
+        self.config_writer.schedule(
+            lambda: self.merge_config_job(hosts, base, known_source), replace=False
+        )
+        return False
+
+    def merge_config_job(self, hosts, base, known_source):
+        """Merge the hosts other instances wrote to gcm.conf, runs in the config writer."""
+        with config_lock():
+            source = ConfigSnapshot.source_key()
+            if source == known_source:
+                return
+            theirs = self.read_disk_hosts(base)
+        ours, base = Wmain.copy_job_hosts(hosts, base)
+        merged, disk = HostUtils.merge_hosts(base, ours, theirs, get_password())
+        GLib.idle_add(
+            self.config_job_done,
+            source,
+            Wmain.original_hosts(disk, hosts, ours),
+            Wmain.original_hosts(ours, hosts, ours),
+            Wmain.original_hosts(merged, hosts, ours) if merged != ours else None,
+        )
 
-        i = self.treeModel.iter_next(i) if i else None
-        while i:
-            self.treeModel[i][3] = self.servers_background_color()
-            self.update_row_color(i)
-            i = self.treeModel.iter_next(i)
+    def config_job_hosts(self):
+        """The hosts for a config writer job, with their password as it is now in the main loop."""
+        return {key: (host, host.password_state()) for key, host in self.current_hosts().items()}
 
-    def get_folder(self, obj, folder, path):
-        if not obj:
+    @staticmethod
+    def copy_job_hosts(hosts, base):
+        """Copy the hosts of a job in the config writer, the window keeps using the originals.
+
+        Returns the copies and base with the copies in place of the unchanged
+        hosts, so merge_hosts still sees them unchanged.
+        """
+        ours = {}
+        base = dict(base)
+        for key, (host, password_state) in hosts.items():
+            ours[key] = copy = host.clone(password_state)
+            if base.get(key) is host:
+                base[key] = copy
+        return ours, base
+
+    @staticmethod
+    def original_hosts(result, hosts, ours):
+        """Replace the copies in result with the hosts they were made from."""
+        return {
+            key: hosts[key][0] if host is ours.get(key) else host for key, host in result.items()
+        }
+
+    def config_job_done(self, source, base, ours=None, merged=None):
+        """Record the gcm.conf a config writer job read or wrote, runs in the main loop."""
+        self.config_source = source
+        if base is not None:
+            self.config_base = base
+        if merged is not None:
+            self.apply_merged_hosts(ours, merged)
+        return False
+
+    def read_disk_hosts(self, base):
+        """Hosts in gcm.conf and its journal, the caller holds config_lock()."""
+        cp = configparser.RawConfigParser()
+        try:
+            cp.read(CONFIG_FILE)
+        except configparser.Error as e:
+            logger.error("%s: %s", _("Entrada invalida en archivo de configuracion"), e)
+            return dict(base)
+        ConfigJournal.replay(cp)
+        hosts = HostUtils.load_hosts_from_ini(cp)
+        return {(host.group, host.name): host for grupo in hosts for host in hosts[grupo]}
+
+    def apply_merged_hosts(self, ours, merged):
+        # lo que se cambio aqui mientras tanto se mantiene
+        result = HostUtils.merge_hosts(ours, self.current_hosts(), merged, get_password())[0]
+        new_groups = {}
+        for host in result.values():
+            new_groups.setdefault(host.group, []).append(host)
+        # los hosts que solo tiene la otra instancia quedan al final
+        self.patch_hosts(HostUtils.sort_groups(new_groups))
+        return False
+
+    def patch_hosts(self, new_groups):
+        """Replace groups with new_groups, updating only the tree rows and menu items that changed."""
+        global groups
+        removed, added, changed = HostUtils.diff_hosts(groups, new_groups, get_password())
+        if not (removed or added or changed):
+            return
+
+        # los hosts sin cambios conservan su objeto, que es el que esta en el arbol
+        replaced = {(old.group, old.name): host for old, host in changed}
+        current = {(host.group, host.name): host for grupo in groups for host in groups[grupo]}
+        merged = {}
+        for grupo in new_groups:
+            merged[grupo] = [
+                replaced.get((grupo, host.name), current.get((grupo, host.name), host))
+                for host in new_groups[grupo]
+            ]
+        groups = merged
+
+        for host in removed:
+            self.remove_host_rows(host)
+        for old, host in changed:
+            self.replace_host_rows(old, host)
+        for host in added:
+            self.add_host_rows(host)
+        if self.filter_text:
+            self.refresh_host_filter()
+
+    def on_inventory_changed(self, event, host, old=None):
+        """Patch the tree and the servers menu after a change made through inventory."""
+        if event == "update":
+            self.replace_host_rows(old, host)
+        if event in ("remove", "move"):
+            self.remove_host_rows(old or host)
+        if event in ("add", "move"):
+            self.add_host_rows(host)
+        if self.filter_text:
+            self.refresh_host_filter()
+
+    def index_hosts(self):
+        """Index every host for the host filter and quick connect, from idle callbacks."""
+        self.cancel_index_hosts()
+        self.host_index = HostSearchIndex()
+        # los archivos de grupo sin leer se indexan al leerlos, ver index_loaded_group
+        self.index_pending = collections.deque(g for g in groups if is_group_loaded(g))
+        self.index_unloaded = {g for g in groups if not is_group_loaded(g)}
+        if isinstance(groups, LazyGroups):
+            groups.on_load = self.index_loaded_group
+        self.index_source = GLib.idle_add(self.index_hosts_step)
+
+    def index_hosts_step(self, finish=False):
+        indexed = 0
+        while self.index_pending and (finish or indexed < INDEX_HOSTS_STEP):
+            # los grupos borrados mientras tanto ya no estan
+            hosts = groups.get(self.index_pending.popleft(), [])
+            for host in hosts:
+                self.host_index.add(host)
+            indexed += len(hosts)
+        if self.index_pending:
+            return True
+        self.index_source = None
+        return False
+
+    def index_loaded_group(self, grupo, hosts):
+        if grupo in self.index_unloaded:
+            self.index_unloaded.discard(grupo)
+            for host in hosts:
+                self.host_index.add(host)
+
+    def cancel_index_hosts(self):
+        if self.index_source is not None:
+            GLib.source_remove(self.index_source)
+            self.index_source = None
+
+    def get_host_index(self):
+        """Return the search index of every host, finishing it now if it is still being built.
+
+        Group files not read yet are read here, a search has to see every host.
+        """
+        if self.host_index is None:
+            self.index_hosts()
+        if self.index_source is not None or self.index_unloaded:
+            self.cancel_index_hosts()
+            self.index_pending.extend(self.index_unloaded)
+            self.index_unloaded = set()
+            self.index_hosts_step(finish=True)
+        return self.host_index
+
+    def quick_connect_hosts(self, query):
+        """Return the hosts for the quick connect palette, best match and most recently used first."""
+        recent = {}
+        for (group, name), used in self.recent_hosts.items():
+            host = inventory.find(group, name)
+            if host is not None:
+                recent[host] = used
+        return self.get_host_index().rank(query, QUICK_CONNECT_RESULTS, recent)
+
+    def show_quick_connect(self):
+        QuickConnectDialog(self, parent=self.wMain).show()
+
+    def on_txtFilterHosts_search_changed(self, widget, *args):
+        self.filter_hosts(widget.get_text().strip())
+
+    def on_txtFilterHosts_stop_search(self, widget, *args):
+        widget.set_text("")
+
+    def filter_hosts(self, text):
+        """Show only the hosts matching text and their folders, every host if text is empty.
+
+        The folders with matching hosts are filled and expanded a few at a
+        time from idle callbacks, as in expand_all_groups.
+        """
+        if not text:
+            self.clear_host_filter()
+            return
+        index = self.get_host_index()
+        # al seguir escribiendo solo se revisan los hosts que ya coincidian
+        candidates = None
+        if self.filter_matches is not None and self.filter_text.lower() in text.lower():
+            candidates = self.filter_matches
+        self.filter_matches = index.search(text, candidates)
+        if not self.filter_text:
+            self.collapsed_before_filter = self.get_collapsed_nodes()
+        self.filter_text = text
+
+        # grupos con hosts que coinciden y sus padres, las subcarpetas aun no tienen filas
+        self.filter_folders = set()
+        for host in self.filter_matches:
+            group = ""
+            for folder in host.group.split("/"):
+                group = group + "/" + folder if group else folder
+                self.filter_folders.add(group)
+
+        self.treeServers.set_model(None)
+        if self.treeFilter is None:
+            self.treeFilter = self.treeModel.filter_new()
+            self.treeFilter.set_visible_func(self.is_row_visible)
+        self.treeFilter.refilter()
+        self.treeServers.set_model(self.treeFilter)
+        self.visible_rows = None
+        # las carpetas con hosts que coinciden tienen que tener sus filas, los padres primero
+        self.cancel_expand_all()
+        pending = collections.deque("/" + group for group in sorted(self.filter_folders))
+        self.expand_source = GLib.idle_add(self.expand_folders_step, pending, False)
+
+    def refresh_host_filter(self):
+        """Filter again once the hosts or the tree rows stop changing, from an idle callback."""
+        if self.filter_refresh_source is None:
+            self.filter_refresh_source = GLib.idle_add(self.refilter_hosts)
+
+    def refilter_hosts(self):
+        """Filter again now, after the hosts or the tree rows changed."""
+        self.cancel_host_filter_refresh()
+        self.filter_matches = None
+        if self.filter_text:
+            self.filter_hosts(self.filter_text)
+        return False
+
+    def cancel_host_filter_refresh(self):
+        if self.filter_refresh_source is not None:
+            GLib.source_remove(self.filter_refresh_source)
+            self.filter_refresh_source = None
+
+    def clear_host_filter(self):
+        if not self.filter_text:
+            return
+        self.cancel_host_filter_refresh()
+        self.cancel_expand_all()
+        self.filter_text = ""
+        self.filter_matches = None
+        self.treeFilter = None
+        self.treeServers.set_model(self.treeModel)
+        self.visible_rows = None
+        self.set_collapsed_nodes(self.collapsed_before_filter)
+
+    def is_row_visible(self, model, iter, data=None):
+        host = model.get_value(iter, 1)
+        if host is not None:
+            return host in self.filter_matches
+        # carpetas con hosts que coinciden, nunca las filas "Cargando..."
+        if model.get_value(iter, 2) != "gtk-directory":
+            return False
+        group = self.get_group(iter)
+        return (group + "/" if group else "") + model.get_value(iter, 0) in self.filter_folders
+
+    def get_host_row(self, host):
+        """Return the tree row of host, None while its folder has not been filled."""
+        path = "/" + host.group
+        if path not in self.folder_iters or path in self.unfilled_folders:
             return None
-        for row in obj:
-            if path == folder + "/" + row[0]:
+        for row in self.treeModel[self.folder_iters[path]].iterchildren():
+            if row[1] is not None and row[1].name == host.name:
                 return row
-            i = self.get_folder(row.iterchildren(), folder + "/" + row[0], path)
-            if i:
-                return i
+        return None
+
+    def add_host_rows(self, host):
+        """Add host to the tree and the servers menu, with the folders it needs."""
+        if self.host_index is not None:
+            self.host_index.add(host)
+        new_folders = []
+        parent, menu = self.add_group_rows(host.group, new_folders)
+        if parent is not None:
+            self.insert_tree_row(parent, [host.name, host, "gtk-network"])
+        if menu is not None:
+            self.insert_menu_item(menu, self.create_host_menu_item(host))
+        if self.filter_text:
+            # refresh_host_filter expande las carpetas nuevas
+            return
+        for folder in new_folders:
+            self.treeServers.expand_row(folder.get_path(), False)
+
+    def replace_host_rows(self, old, host):
+        """Show host, with the same group and name, in place of old."""
+        if self.host_index is not None:
+            self.host_index.remove(old)
+            self.host_index.add(host)
+        row = self.get_host_row(old)
+        if row is not None:
+            row[1] = host
+        menu = self.folder_menus.get("/" + host.group)
+        if menu is not None:
+            self.remove_menu_item(menu, host.name)
+            self.insert_menu_item(menu, self.create_host_menu_item(host))
+
+    def remove_host_rows(self, host):
+        """Remove host from the tree and the servers menu, with the folders left empty."""
+        if self.host_index is not None:
+            self.host_index.remove(host)
+        row = self.get_host_row(host)
+        if row is not None:
+            self.treeModel.remove(row.iter)
+        menu = self.folder_menus.get("/" + host.group)
+        if menu is not None:
+            self.remove_menu_item(menu, host.name)
+
+        path = "/" + host.group
+        while path and path[1:] not in groups and not self.subfolders.get(path):
+            row = self.folder_iters.pop(path, None)
+            if row is not None:
+                self.treeModel.remove(row)
+            self.unfilled_folders.discard(path)
+            self.folder_menus.pop(path, None)
+            self.subfolders.pop(path, None)
+            path, folder = path.rsplit("/", 1)
+            self.subfolders[path].discard(folder)
+            menu = self.folder_menus.get(path)
+            if menu is not None:
+                self.remove_menu_item(menu, folder, True)
+
+    def remove_menu_item(self, menu, label, folder=False):
+        for item in menu.get_children():
+            if (item.get_submenu() is not None) == folder and item.get_label() == label:
+                menu.remove(item)
+                return
 
-    def get_folder_menu(self, obj, folder, path):
-        if not obj or not isinstance(obj, (Gtk.Menu, Gtk.MenuItem)):
-            return None
-        for item in obj.get_children():
-            if path == folder + "/" + item.get_label():
-                return item.get_submenu()
-            i = self.get_folder_menu(item.get_submenu(), folder + "/" + item.get_label(), path)
-            if i:
-                return i
+    def add_group_rows(self, grupo, new_folders):
+        """Return the tree row and submenu of grupo, adding the missing folders to new_folders.
+
+        The row is None while the folder has not been filled, and the submenu
+        while it has not been shown.
+        """
+        parent = None
+        path = ""
+        for folder in grupo.split("/"):
+            children = self.subfolders.setdefault(path, set())
+            menu = self.folder_menus.get(path)
+            shown = path == "" or (parent is not None and path not in self.unfilled_folders)
+            path = path + "/" + folder
+            row = self.folder_iters.get(path)
+            if row is None and shown:
+                row = self.insert_tree_row(parent, [folder, None, "gtk-directory"])
+                self.folder_iters[path] = row
+                new_folders.append(
+                    Gtk.TreeRowReference.new(self.treeModel, self.treeModel.get_path(row))
+                )
+            parent = row
+
+            if folder not in children:
+                children.add(folder)
+                if menu is not None:
+                    self.insert_menu_item(menu, self.create_folder_menu_item(path))
+        if path in self.unfilled_folders:
+            parent = None
+        return parent, self.folder_menus.get(path)
+
+    def insert_tree_row(self, parent, values):
+        """Insert values under parent in updateTree's order: folders first, then hosts, by name."""
+        folder = values[1] is None
+        child = self.treeModel.iter_children(parent)
+        while child is not None:
+            child_folder = self.treeModel.get_value(child, 1) is None
+            if (folder and not child_folder) or (
+                folder == child_folder and self.treeModel.get_value(child, 0) > values[0]
+            ):
+                return self.treeModel.insert_before(parent, child, values)
+            child = self.treeModel.iter_next(child)
+        return self.treeModel.append(parent, values)
+
+    def insert_menu_item(self, menu, item):
+        """Insert item in menu in updateTree's order: folders first, then hosts, by name."""
+        folder = item.get_submenu() is not None
+        for position, child in enumerate(menu.get_children()):
+            child_folder = child.get_submenu() is not None
+            if (folder and not child_folder) or (
+                folder == child_folder and child.get_label() > item.get_label()
+            ):
+                menu.insert(item, position)
+                return
+        menu.append(item)
 
-    def writeConfig(self):
-        global groups
+    def update_row_color(self):
+        """Take the stripe colors from the theme and repaint the servers tree."""
+        rgba = self.treeServers.get_style_context().get_property(
+            "background-color", Gtk.StateFlags.NORMAL
+        )
+        self.color_back1 = parse_color_rgba(color_to_hex(rgba))
+        self.color_back2 = parse_color_rgba(color_to_hex(rgba, -14))
+        self.treeServers.queue_draw()
 
+    def writeConfig(self):
         cp = configparser.RawConfigParser()
         cp.read(CONFIG_FILE + ".tmp")
 
+        self.write_settings(cp)
+
+        # con otro almacenamiento gcm.conf solo guarda la configuracion
+        hosts = self.config_job_hosts() if self.get_host_store() is None else None
+        base, known_source = self.config_base, self.config_source
+        self.journal_records = 0
+        self.config_writer.schedule(lambda: self.write_config_job(cp, hosts, base, known_source))
+
+    def write_config_job(self, cp, hosts, base, known_source):
+        """Write cp and the hosts to gcm.conf, runs in the config writer."""
+        pwd = get_password()
+        ours, base = Wmain.copy_job_hosts(hosts or {}, base)
+        # cifrar fuera del bloqueo, luego solo se copian las claves cifradas
+        with cipher_cache():
+            for host in ours.values():
+                host.set_encrypted_password(pwd, host.get_encrypted_password(pwd))
+        f = io.StringIO()
+        cp.write(f)
+        settings_text = f.getvalue()
+        hosts_text, snapshot_hosts = HostUtils.hosts_config_text(ours.values())
+
+        merged = ours
+        with config_lock():
+            source = ConfigSnapshot.source_key()
+            if hosts is not None and source != known_source:
+                # otra instancia escribio gcm.conf o el diario
+                merged = HostUtils.merge_hosts(base, ours, self.read_disk_hosts(base), pwd)[0]
+                if merged != ours:
+                    hosts_text, snapshot_hosts = HostUtils.hosts_config_text(merged.values())
+            self.config_writer.write(CONFIG_FILE, settings_text + hosts_text)
+            # todo lo que tenia el diario ya esta en gcm.conf
+            ConfigJournal.clear()
+            source = ConfigSnapshot.source_key()
+        ConfigSnapshot.save(source, cp, snapshot_hosts, 0)
+        # no recargar nuestra propia escritura
+        GLib.idle_add(
+            self.config_job_done,
+            source,
+            Wmain.original_hosts(merged, hosts, ours) if hosts is not None else None,
+            Wmain.original_hosts(ours, hosts, ours),
+            Wmain.original_hosts(merged, hosts, ours) if merged != ours else None,
+        )
+
+    def write_settings(self, cp):
+        """Add the options, window and shortcuts sections to cp."""
         cp.add_section("options")
         cp.set("options", "word-separators", conf.WORD_SEPARATORS)
         cp.set("options", "buffer-lines", conf.BUFFER_LINES)
@@ -2081,6 +2847,8 @@ class Wmain(GladeComponent):
         cp.set("options", "cycle-tabs", conf.CYCLE_TABS)
         cp.set("options", "update-title", conf.UPDATE_TITLE)
         cp.set("options", "app-title", conf.APP_TITLE or app_name)
+        cp.set("options", "journal", conf.JOURNAL)
+        cp.set("options", "hosts-storage", conf.HOSTS_STORAGE)
 
         collapsed_folders = ",".join(self.get_collapsed_nodes())
         cp.add_section("window")
@@ -2091,14 +2859,6 @@ class Wmain(GladeComponent):
         cp.set("window", "show-panel", conf.SHOW_PANEL)
         cp.set("window", "show-toolbar", conf.SHOW_TOOLBAR)
 
-        i = 1
-        for grupo in groups:
-            for host in groups[grupo]:
-                section = "host " + str(i)
-                cp.add_section(section)
-                HostUtils.save_host_to_ini(cp, section, host)
-                i += 1
-
         cp.add_section("shortcuts")
         i = 1
         for s in shortcuts:
@@ -2109,9 +2869,76 @@ class Wmain(GladeComponent):
                 cp.set("shortcuts", f"command{i}", shortcuts[s].replace("\n", "\\n"))
                 i = i + 1
 
-        with Path(CONFIG_FILE + ".tmp").open("w") as f:
-            cp.write(f)
-        Path(CONFIG_FILE + ".tmp").rename(CONFIG_FILE)
+    def get_host_store(self):
+        """Return the store keeping the hosts outside gcm.conf, None when they are in gcm.conf."""
+        if conf.HOSTS_STORAGE == HOSTS_STORAGE_SQLITE:
+            return SqliteHostStore(Path(CONFIG_FILE).with_name("hosts.db"))
+        if conf.HOSTS_STORAGE == HOSTS_STORAGE_GROUP_FILES:
+            return GroupFilesHostStore(Path(CONFIG_FILE).with_name("hosts.d"))
+        return None
+
+    def journal_enabled(self):
+        # un archivo con claves antiguas se reescribe completo con la clave nueva
+        return conf.JOURNAL and conf.VERSION != 0
+
+    def append_journal(self, records):
+        ConfigJournal.append(records)
+        self.journal_records += len(records)
+        if self.journal_records >= JOURNAL_COMPACT_RECORDS:
+            self.writeConfig()
+
+    def save_settings(self):
+        """Persist options, window state and shortcuts."""
+        if not self.journal_enabled():
+            self.writeConfig()
+            return
+        cp = configparser.RawConfigParser()
+        self.write_settings(cp)
+        self.append_journal([ConfigJournal.section_record(cp, section) for section in cp.sections()])
+
+    def save_host(self, host, old_group=None, old_name=None):
+        """Persist a new or edited host, old_group/old_name identify the host it replaces."""
+        store = self.get_host_store()
+        if store is not None:
+            try:
+                store.save_host(host, old_group, old_name)
+            except (sqlite3.Error, OSError) as e:
+                logger.error("Unable to write %s: %s", store.path, e)
+                msgbox(f"{_('No se puede escribir')} {store.path}: {e}")
+            return
+        if not self.journal_enabled():
+            self.writeConfig()
+            return
+        old = [old_group, old_name] if old_group is not None else None
+        self.append_journal([ConfigJournal.host_record(host, old)])
+
+    def delete_hosts(self, hosts):
+        """Persist the removal of hosts."""
+        store = self.get_host_store()
+        if store is not None:
+            try:
+                store.delete_hosts(hosts)
+            except (sqlite3.Error, OSError) as e:
+                logger.error("Unable to write %s: %s", store.path, e)
+                msgbox(f"{_('No se puede escribir')} {store.path}: {e}")
+            return
+        if not self.journal_enabled():
+            self.writeConfig()
+            return
+        self.append_journal(
+            [{"op": "delete", "group": host.group, "name": host.name} for host in hosts]
+        )
+
+    def save_all_hosts(self):
+        """Persist a host list that was replaced as a whole (import, storage change)."""
+        store = self.get_host_store()
+        if store is not None:
+            try:
+                store.save_all(groups)
+            except (sqlite3.Error, OSError) as e:
+                logger.error("Unable to write %s: %s", store.path, e)
+                msgbox(f"{_('No se puede escribir')} {store.path}: {e}")
+        self.writeConfig()
 
     def on_tab_scroll(self, notebook, event):
         # According to https://sourcecodequery.com/example-method/Gdk.Event.get_scroll_deltas
@@ -2420,12 +3247,23 @@ class Wmain(GladeComponent):
 
     def get_context_tree_iter(self):
         if self._context_tree_path is not None:
+            model = self.treeServers.get_model()
             try:
-                return self.treeModel.get_iter(self._context_tree_path)
+                return self.to_model_iter(model, model.get_iter(self._context_tree_path))
             except (TypeError, ValueError):
                 return None
-        selection = self.treeServers.get_selection()
-        model, iter_ = selection.get_selected()
+        return self.get_selected_iter()
+
+    def get_selected_iter(self):
+        """Return the treeModel iter of the selected row, or None."""
+        model, iter_ = self.treeServers.get_selection().get_selected()
+        return self.to_model_iter(model, iter_)
+
+    def to_model_iter(self, model, iter_):
+        """Convert an iter of the model shown by treeServers to a treeModel iter."""
+        if iter_ is not None and model is not self.treeModel:
+            # la vista muestra el filtro de hosts
+            return model.convert_iter_to_child_iter(iter_)
         return iter_
 
     def get_selected_host(self):
@@ -2451,19 +3289,53 @@ class Wmain(GladeComponent):
             return
         group = self.get_group(iter_)
         newname = f"{host.name} (copy)"
-        for h in groups.get(group, []):
-            if h.name == newname:
-                newname = f"{newname} (copy)"
+        while inventory.find(group, newname) is not None:
+            newname = f"{newname} (copy)"
         newhost = host.clone()
         newhost.name = newname
-        groups.setdefault(group, []).append(newhost)
-        self.updateTree()
-        self.writeConfig()
+        newhost.group = group
+        inventory.add(newhost)
+        self.save_host(newhost)
 
     def expand_all_groups(self):
-        self.treeServers.expand_all()
+        """Fill and expand every folder, a few at a time from idle callbacks."""
+        self.cancel_expand_all()
+        pending = collections.deque(self.folder_iters)
+        self.expand_source = GLib.idle_add(self.expand_folders_step, pending)
+
+    def expand_folders_step(self, pending, subfolders=True):
+        self.updating_tree = True
+        for _i in range(EXPAND_FOLDERS_STEP):
+            if not pending:
+                break
+            path = pending.popleft()
+            if path not in self.folder_iters:
+                # se borro mientras tanto
+                continue
+            self.fill_folder(path)
+            tree_path = self.treeModel.get_path(self.folder_iters[path])
+            if self.treeFilter is not None:
+                # la vista muestra el filtro de hosts
+                tree_path = self.treeFilter.convert_child_path_to_path(tree_path)
+            if tree_path is not None:
+                self.treeServers.expand_row(tree_path, False)
+            if subfolders:
+                pending.extend(
+                    path + "/" + folder for folder in sorted(self.subfolders.get(path, ()))
+                )
+        self.updating_tree = False
+        if pending:
+            return True
+        self.expand_source = None
+        return False
+
+    def cancel_expand_all(self):
+        if self.expand_source is not None:
+            GLib.source_remove(self.expand_source)
+            self.expand_source = None
 
     def collapse_all_groups(self):
+        self.cancel_expand_all()
         self.treeServers.collapse_all()
 
     def run_custom_command(self, command):
@@ -2496,6 +3368,7 @@ class Wmain(GladeComponent):
 
     def quit_application(self):
         """Quit through GtkApplication when available (fallback to Gtk.main_quit)."""
+        self.config_writer.flush()
         window = self.get_widget("wMain")
         application = window.get_application() if isinstance(window, Gtk.Window) else None
         if application is not None:
@@ -2579,11 +3452,27 @@ class Wmain(GladeComponent):
             except (configparser.Error, ValueError, AttributeError) as e:
                 msgbox(f"{_('Archivo invalido')}: {e}")
                 return
-            # sobreescribir lista de hosts
-            global groups
-            groups = grupos
 
-            self.updateTree()
+            def imported(_result, error):
+                if error is not None:
+                    msgbox(f"{_('Archivo invalido')}: {error}")
+                    return
+                # sobreescribir lista de hosts
+                global groups
+                groups = HostUtils.sort_groups(grupos)
+
+                self.index_hosts()
+                self.updateTree()
+                self.save_all_hosts()
+
+            # the import key is not kept, passwords are decrypted now and re-encrypted on save
+            self.start_background_task(
+                _("Importando servidores"),
+                list(grupos.values()),
+                HostUtils.decrypt_passwords,
+                None,
+                imported,
+            )
 
     # -- Wmain.on_importar_servidores1_activate }
 
@@ -2599,27 +3488,73 @@ class Wmain(GladeComponent):
             if password is None:
                 return
 
-            try:
+            global groups
+            # copias, el hilo descifra las claves sin tocar los hosts que usa la ventana
+            hosts_by_group = [[host.clone() for host in groups[grupo]] for grupo in groups]
+            cancelled = Event()
+
+            def write_export(passwords_by_group):
                 cp = configparser.RawConfigParser()
                 cp.read(filename + ".tmp")
-                i = 1
                 cp.add_section("gcm")
                 cp.set("gcm", "gcm", encrypt(password, password[::-1]))
-                global groups
-                for grupo in groups:
-                    for host in groups[grupo]:
-                        section = "host " + str(i)
-                        cp.add_section(section)
-                        HostUtils.save_host_to_ini(cp, section, host, password)
-                        i += 1
+                HostUtils.save_hosts_to_ini(
+                    cp,
+                    [host for hosts in hosts_by_group for host in hosts],
+                    password,
+                    [value for passwords in passwords_by_group for value in passwords],
+                )
                 with Path(filename + ".tmp").open("w") as f:
                     cp.write(f)
+                if cancelled.is_set():
+                    Path(filename + ".tmp").unlink()
+                    return
                 Path(filename + ".tmp").rename(filename)
-            except (OSError, PermissionError) as e:
-                msgbox(f"{_('Archivo invalido')}: {e}")
+
+            def exported(_result, error):
+                if error is not None:
+                    msgbox(f"{_('Archivo invalido')}: {error}")
+
+            self.start_background_task(
+                _("Exportando servidores"),
+                hosts_by_group,
+                lambda hosts: HostUtils.encrypt_passwords(hosts, password),
+                write_export,
+                exported,
+                cancelled,
+            )
 
     # -- Wmain.on_exportar_servidores1_activate }
 
+    def start_background_task(self, title, chunks, work, finish, on_done, cancelled=None):
+        """Run work over chunks in a BackgroundTask, showing progress in the main window."""
+        if self.background_task is not None:
+            msgbox(_("Espere a que termine la operacion en curso"))
+            return None
+        self.progressBar.set_text(title)
+        self.progressBar.set_fraction(0.0)
+        self.boxProgress.show()
+
+        def done(result, error):
+            self.boxProgress.hide()
+            self.background_task = None
+            on_done(result, error)
+
+        self.background_task = BackgroundTask(
+            chunks, work, finish, self.on_background_progress, done, cancelled
+        )
+        self.background_task.start()
+        return self.background_task
+
+    def on_background_progress(self, done, total):
+        self.progressBar.set_fraction(done / total if total else 1.0)
+
+    def on_btnCancelProgress_clicked(self, widget, *args):
+        if self.background_task is not None:
+            self.background_task.cancel()
+            self.background_task = None
+        self.boxProgress.hide()
+
     # -- Wmain.on_salir1_activate {
     def on_salir1_activate(self, widget, *args):
         self.request_quit()
@@ -2692,13 +3627,11 @@ class Wmain(GladeComponent):
 
     # -- Wmain.on_btnConnect_clicked {
     def on_btnConnect_clicked(self, widget, *args):
-        if self.treeServers.get_selection().get_selected()[1] is not None:
-            if not self.treeModel.iter_has_child(
-                self.treeServers.get_selection().get_selected()[1]
-            ):
+        if self.get_selected_iter() is not None:
+            if not self.treeModel.iter_has_child(self.get_selected_iter()):
                 self.on_tvServers_row_activated(self.treeServers)
             else:
-                selected = self.treeServers.get_selection().get_selected()[1]
+                selected = self.get_selected_iter()
                 group = self.treeModel.get_value(selected, 0)
                 parent_group = self.get_group(selected)
                 if parent_group != "":
@@ -2714,18 +3647,17 @@ class Wmain(GladeComponent):
     # -- Wmain.on_btnAdd_clicked {
     def on_btnAdd_clicked(self, widget, *args):
         group = ""
-        if self.treeServers.get_selection().get_selected()[1] is not None:
-            selected = self.treeServers.get_selection().get_selected()[1]
+        if self.get_selected_iter() is not None:
+            selected = self.get_selected_iter()
             group = self.get_group(selected)
-            if self.treeModel.iter_has_child(self.treeServers.get_selection().get_selected()[1]):
-                selected = self.treeServers.get_selection().get_selected()[1]
+            if self.treeModel.iter_has_child(self.get_selected_iter()):
+                selected = self.get_selected_iter()
                 group = self.treeModel.get_value(selected, 0)
                 parent_group = self.get_group(selected)
                 if parent_group != "":
                     group = parent_group + "/" + group
         wHost = Whost()
         wHost.init(group)
-        self.updateTree()
 
     # -- Wmain.on_btnAdd_clicked }
 
@@ -2740,12 +3672,10 @@ class Wmain(GladeComponent):
 
     # -- Wmain.on_bntEdit_clicked {
     def on_bntEdit_clicked(self, widget, *args):
-        if self.treeServers.get_selection().get_selected()[
-            1
-        ] is not None and not self.treeModel.iter_has_child(
-            self.treeServers.get_selection().get_selected()[1]
+        if self.get_selected_iter() is not None and not self.treeModel.iter_has_child(
+            self.get_selected_iter()
         ):
-            selected = self.treeServers.get_selection().get_selected()[1]
+            selected = self.get_selected_iter()
             host = self.treeModel.get_value(selected, 1)
             wHost = Whost()
             wHost.init(host.group, host)
@@ -2755,41 +3685,38 @@ class Wmain(GladeComponent):
 
     # -- Wmain.on_btnDel_clicked {
     def on_btnDel_clicked(self, widget, *args):
-        if self.treeServers.get_selection().get_selected()[1] is not None:
-            if not self.treeModel.iter_has_child(
-                self.treeServers.get_selection().get_selected()[1]
-            ):
+        if self.get_selected_iter() is not None:
+            if not self.treeModel.iter_has_child(self.get_selected_iter()):
                 # Eliminar solo el nodo
-                name = self.treeModel.get_value(
-                    self.treeServers.get_selection().get_selected()[1], 0
-                )
+                name = self.treeModel.get_value(self.get_selected_iter(), 0)
                 if (
                     msgconfirm("{} [{}]?".format(_("Confirma que desea eliminar el host"), name))
                     == Gtk.ResponseType.OK
                 ):
-                    host = self.treeModel.get_value(
-                        self.treeServers.get_selection().get_selected()[1], 1
-                    )
-                    groups[host.group].remove(host)
-                    self.updateTree()
+                    host = self.treeModel.get_value(self.get_selected_iter(), 1)
+                    inventory.remove(host)
+                    self.delete_hosts([host])
             else:
                 # Eliminar todo el grupo
-                group = self.get_group(
-                    self.treeModel.iter_children(self.treeServers.get_selection().get_selected()[1])
-                )
+                group = self.get_group(self.treeModel.iter_children(self.get_selected_iter()))
                 if (
                     msgconfirm(
                         "{} [{}]?".format(_("Confirma que desea eliminar todos los hosts del grupo"), group)
                     )
                     == Gtk.ResponseType.OK
                 ):
+                    removed = []
                     with contextlib.suppress(KeyError):
-                        del groups[group]
+                        removed += groups.pop(group)
                     for h in dict(groups):
                         if h.startswith(group + "/"):
-                            del groups[h]
+                            removed += groups.pop(h)
+                    inventory.invalidate_index()
+                    if self.host_index is not None:
+                        for host in removed:
+                            self.host_index.remove(host)
                     self.updateTree()
-        self.writeConfig()
+                    self.delete_hosts(removed)
 
     # -- Wmain.on_btnDel_clicked }
 
@@ -2933,18 +3860,25 @@ class Wmain(GladeComponent):
     # -- Wmain.on_tvServers_row_activated {
     def on_tvServers_row_activated(self, widget, *args):
         self.row_activated = True
-        if not self.treeModel.iter_has_child(widget.get_selection().get_selected()[1]):
-            selected = widget.get_selection().get_selected()[1]
+        if not self.treeModel.iter_has_child(self.get_selected_iter()):
+            selected = self.get_selected_iter()
             host = self.treeModel.get_value(selected, 1)
             self.addTab(self.nbConsole, host)
 
     # -- Wmain.on_tvServers_row_activated }
 
     def on_tvServers_row_collapsed(self, widget, *args):
-        self.update_row_color()
+        self.invalidate_row_stripes()
 
-    def on_tvServers_row_expanded(self, widget, *args):
-        self.update_row_color()
+    def on_tvServers_row_expanded(self, widget, iter, path, *args):
+        self.invalidate_row_stripes()
+        if self.updating_tree:
+            return
+        if self.unfilled_folders:
+            iter = self.to_model_iter(widget.get_model(), iter)
+            grupo = self.get_group(iter)
+            grupo = (grupo + "/" if grupo != "" else "") + self.treeModel.get_value(iter, 0)
+            self.fill_folder("/" + grupo)
 
     def on_tvServers_style_updated(self, widget, *args):
         self.update_row_color()
@@ -2964,7 +3898,8 @@ class Wmain(GladeComponent):
             else:
                 path, col, cellx, celly = pthinfo
                 self.set_context_tree_path(path)
-                if self.treeModel.iter_children(self.treeModel.get_iter(path)):
+                model = self.treeServers.get_model()
+                if model.iter_children(model.get_iter(path)):
                     self.popupMenuFolder.mnuEdit.hide()
                     self.popupMenuFolder.mnuCopyAddress.hide()
                     self.popupMenuFolder.mnuDup.hide()
@@ -3029,55 +3964,137 @@ class Wmain(GladeComponent):
     # -- Wmain.on_tvServers_button_press_event }
 
 
+def _intern(value):
+    """Share one copy of the strings repeated across many hosts."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class Host:
-    def __init__(self, *args):
-        try:
-            self.i = 0
-            self.group = self.get_arg(args, None)
-            self.name = self.get_arg(args, None)
-            self.description = self.get_arg(args, None)
-            self.host = self.get_arg(args, None)
-            self.user = self.get_arg(args, None)
-            self.password = self.get_arg(args, None)
-            self.private_key = self.get_arg(args, None)
-            self.port = self.get_arg(args, 22)
-            self.tunnel = self.get_arg(args, "").split(",")
-            self.type = self.get_arg(args, "ssh")
-            self.commands = self.get_arg(args, None)
-            self.keep_alive = self.get_arg(args, 0)
-            self.font_color = self.get_arg(args, "")
-            self.back_color = self.get_arg(args, "")
-            self.x11 = self.get_arg(args, False)
-            self.agent = self.get_arg(args, False)
-            self.compression = self.get_arg(args, False)
-            self.compressionLevel = self.get_arg(args, "")
-            self.extra_params = self.get_arg(args, "")
-            self.log = self.get_arg(args, False)
-            self.backspace_key = self.get_arg(args, int(Vte.EraseBinding.AUTO))
-            self.delete_key = self.get_arg(args, int(Vte.EraseBinding.AUTO))
-            self.term = self.get_arg(args, "")
-        except (IndexError, ValueError, AttributeError):
-            pass
+    # atributos fijos, sin __dict__ por host
+    __slots__ = (
+        "group",
+        "name",
+        "description",
+        "host",
+        "user",
+        "_password",
+        # Ciphertext and key of a password that has not been decrypted yet
+        "_encrypted_password",
+        "private_key",
+        "port",
+        "tunnel",
+        "type",
+        "commands",
+        "keep_alive",
+        "font_color",
+        "back_color",
+        "x11",
+        "agent",
+        "compression",
+        "compressionLevel",
+        "extra_params",
+        "log",
+        "backspace_key",
+        "delete_key",
+        "term",
+    )
 
-    def get_arg(self, args, default):
-        arg = args[self.i] if len(args) > self.i else default
-        self.i += 1
-        return arg
+    def __init__(
+        self,
+        group=None,
+        name=None,
+        description=None,
+        host=None,
+        user=None,
+        password=None,
+        private_key=None,
+        port=22,
+        tunnel="",
+        type="ssh",
+        commands=None,
+        keep_alive=0,
+        font_color="",
+        back_color="",
+        x11=False,
+        agent=False,
+        compression=False,
+        compressionLevel="",
+        extra_params="",
+        log=False,
+        backspace_key=int(Vte.EraseBinding.AUTO),
+        delete_key=int(Vte.EraseBinding.AUTO),
+        term="",
+    ):
+        self.group = _intern(group)
+        self.name = name
+        self.description = description
+        self.host = host
+        self.user = _intern(user)
+        self.password = password
+        self.private_key = _intern(private_key)
+        self.port = _intern(port)
+        self.tunnel = (tunnel or "").split(",")
+        self.type = _intern(type)
+        self.commands = commands
+        self.keep_alive = _intern(keep_alive)
+        self.font_color = _intern(font_color)
+        self.back_color = _intern(back_color)
+        self.x11 = x11
+        self.agent = agent
+        self.compression = compression
+        self.compressionLevel = _intern(compressionLevel)
+        self.extra_params = _intern(extra_params)
+        self.log = log
+        self.backspace_key = backspace_key
+        self.delete_key = delete_key
+        self.term = _intern(term)
 
     def __repr__(self):
         return f"group=[{self.group}],\t name=[{self.name}],\t host=[{self.host}],\t type=[{self.type}]"
 
+    @property
+    def password(self):
+        if self._encrypted_password is not None:
+            pwd, ciphertext = self._encrypted_password
+            self._password = decrypt(pwd, ciphertext)
+            self._encrypted_password = None
+        return self._password
+
+    @password.setter
+    def password(self, value):
+        self._password = value
+        self._encrypted_password = None
+
+    def set_encrypted_password(self, pwd, ciphertext):
+        """Keep the password encrypted until it is first read."""
+        self._password = None
+        self._encrypted_password = (pwd, ciphertext)
+
+    def is_encrypted_with(self, pwd):
+        return self._encrypted_password is not None and self._encrypted_password[0] == pwd
+
+    def get_encrypted_password(self, pwd):
+        """Return the password encrypted with pwd, reusing the loaded ciphertext if possible."""
+        if self.is_encrypted_with(pwd):
+            return self._encrypted_password[1]
+        return encrypt(pwd, self.password)
+
+    def password_state(self):
+        """The password as it is kept now, for clone() in another thread."""
+        return self._password, self._encrypted_password
+
     def tunnel_as_string(self):
         return ",".join(self.tunnel)
 
-    def clone(self):
-        return Host(
+    def to_args(self):
+        """Arguments that rebuild this host with Host(*args), without the password."""
+        return (
             self.group,
             self.name,
             self.description,
             self.host,
             self.user,
-            self.password,
+            None,
             self.private_key,
             self.port,
             self.tunnel_as_string(),
@@ -3097,6 +4114,15 @@ class Host:
             self.term,
         )
 
+    def clone(self, password_state=None):
+        host = Host.__new__(Host)
+        for attr in Host.__slots__:
+            setattr(host, attr, getattr(self, attr))
+        host.tunnel = list(self.tunnel)
+        if password_state is not None:
+            host._password, host._encrypted_password = password_state
+        return host
+
 
 class HostUtils:
     @staticmethod
@@ -3114,7 +4140,7 @@ class HostUtils:
         name = cp.get(section, "name")
         host = cp.get(section, "host")
         user = cp.get(section, "user")
-        password = decrypt(pwd, cp.get(section, "pass"))
+        password = cp.get(section, "pass")
         description = HostUtils.get_val(cp, section, "description", "")
         private_key = HostUtils.get_val(cp, section, "private_key", "")
         port = HostUtils.get_val(cp, section, "port", "22")
@@ -3140,42 +4166,183 @@ class HostUtils:
         delete_key = int(HostUtils.get_val(cp, section, "delete-key", int(Vte.EraseBinding.AUTO)))
         term = HostUtils.get_val(cp, section, "term", "")
         h = Host(
-            group,
-            name,
-            description,
-            host,
-            user,
-            password,
-            private_key,
-            port,
-            tunnel,
-            ctype,
-            commands,
-            keepalive,
-            fcolor,
-            bcolor,
-            x11,
-            agent,
-            compression,
-            compressionLevel,
-            extra_params,
-            log,
-            backspace_key,
-            delete_key,
-            term,
+            group=group,
+            name=name,
+            description=description,
+            host=host,
+            user=user,
+            private_key=private_key,
+            port=port,
+            tunnel=tunnel,
+            type=ctype,
+            commands=commands,
+            keep_alive=keepalive,
+            font_color=fcolor,
+            back_color=bcolor,
+            x11=x11,
+            agent=agent,
+            compression=compression,
+            compressionLevel=compressionLevel,
+            extra_params=extra_params,
+            log=log,
+            backspace_key=backspace_key,
+            delete_key=delete_key,
+            term=term,
         )
+        if conf.VERSION == 0:
+            # legacy keys are replaced right after loading, decrypt while they are valid
+            h.password = decrypt(pwd, password)
+        else:
+            h.set_encrypted_password(pwd, password)
         return h
 
     @staticmethod
-    def save_host_to_ini(cp, section, host, pwd=""):
+    def decrypt_passwords(hosts):
+        """Decrypt the pending passwords of hosts, one batch per key."""
+        pending = {}
+        for host in hosts:
+            if host._encrypted_password is not None:
+                pending.setdefault(host._encrypted_password[0], []).append(host)
+        for pwd, batch in pending.items():
+            ciphertexts = [host._encrypted_password[1] for host in batch]
+            for host, password in zip(batch, decrypt_many(pwd, ciphertexts)):
+                host.password = password
+
+    @staticmethod
+    def encrypt_passwords(hosts, pwd):
+        """Return the passwords of hosts encrypted with pwd, in one batch."""
+        pending = [host for host in hosts if not host.is_encrypted_with(pwd)]
+        HostUtils.decrypt_passwords(pending)
+        encrypted = iter(encrypt_many(pwd, [host.password for host in pending]))
+        return [
+            host.get_encrypted_password(pwd) if host.is_encrypted_with(pwd) else next(encrypted)
+            for host in hosts
+        ]
+
+    @staticmethod
+    def sort_groups(hosts):
+        """Sort the hosts of every group by name, the order the tree and menus show."""
+        for group_hosts in hosts.values():
+            group_hosts.sort(key=operator.attrgetter("name"))
+        return hosts
+
+    @staticmethod
+    def load_hosts_from_ini(cp):
+        """Return the hosts in the "host N" sections of cp by group, sorted by name."""
+        hosts = {}
+        with cipher_cache():
+            for section in cp.sections():
+                if not section.startswith("host "):
+                    continue
+                try:
+                    host = HostUtils.load_host_from_ini(cp, section)
+                    hosts.setdefault(host.group, []).append(host)
+                except (configparser.Error, ValueError, AttributeError) as e:
+                    logger.error("%s: %s", _("Entrada invalida en archivo de configuracion"), e)
+        return HostUtils.sort_groups(hosts)
+
+    @staticmethod
+    def diff_hosts(old_groups, new_groups, pwd):
+        """Compare two groups dicts by group and name.
+
+        Returns the hosts only in old_groups, the hosts only in new_groups
+        and (old, new) pairs for the hosts whose settings or password differ.
+        """
+        old = {(host.group, host.name): host for grupo in old_groups for host in old_groups[grupo]}
+        new = {(host.group, host.name): host for grupo in new_groups for host in new_groups[grupo]}
+        removed = [old[key] for key in old if key not in new]
+        added = [new[key] for key in new if key not in old]
+        changed = [
+            (old[key], new[key])
+            for key in new
+            if key in old and not HostUtils.same_host(old[key], new[key], pwd)
+        ]
+        return removed, added, changed
+
+    @staticmethod
+    def same_host(a, b, pwd):
+        if a is b:
+            return True
+        # comparar las claves encriptadas evita desencriptar las que no cambiaron
+        same_ciphertext = (
+            a.is_encrypted_with(pwd)
+            and b.is_encrypted_with(pwd)
+            and a.get_encrypted_password(pwd) == b.get_encrypted_password(pwd)
+        )
+        return a.to_args() == b.to_args() and (same_ciphertext or a.password == b.password)
+
+    @staticmethod
+    def merge_hosts(base, ours, theirs, pwd):
+        """Three-way merge of hosts dicts keyed by (group, name).
+
+        base is what was on disk when ours was loaded or last written, a host
+        of ours is unchanged while it is the same object as in base. theirs
+        is what is on disk now. Changes made only on one side are kept, when
+        both sides changed a host ours wins.
+
+        Returns the merged hosts and the hosts that match theirs, usable as
+        the next base.
+        """
+        merged = {}
+        disk = {}
+        for key, host in ours.items():
+            if host is not base.get(key):
+                merged[key] = host
+            elif key not in theirs:
+                # borrado por la otra instancia
+                continue
+            elif HostUtils.same_host(host, theirs[key], pwd):
+                merged[key] = disk[key] = host
+            else:
+                merged[key] = disk[key] = theirs[key]
+        for key, host in theirs.items():
+            if key not in ours and key not in base:
+                merged[key] = host
+            disk.setdefault(key, host)
+        return merged, disk
+
+    @staticmethod
+    def save_hosts_to_ini(cp, hosts, pwd="", passwords=None):
+        """Save hosts to sections "host 1".."host N".
+
+        passwords are the already encrypted passwords of hosts, they are
+        encrypted in one batch when not given.
+        """
+        if pwd == "":
+            pwd = get_password()
+        if passwords is None:
+            passwords = HostUtils.encrypt_passwords(hosts, pwd)
+        for i, (host, password) in enumerate(zip(hosts, passwords), 1):
+            section = "host " + str(i)
+            cp.add_section(section)
+            HostUtils.save_host_to_ini(cp, section, host, pwd, password)
+
+    @staticmethod
+    def hosts_config_text(hosts):
+        """Return the "host N" sections of gcm.conf for hosts and their (args, ciphertext)."""
+        cp = configparser.RawConfigParser()
+        snapshot_hosts = []
+        for i, host in enumerate(hosts, 1):
+            section = "host " + str(i)
+            cp.add_section(section)
+            HostUtils.save_host_to_ini(cp, section, host)
+            snapshot_hosts.append((host.to_args(), cp.get(section, "pass")))
+        f = io.StringIO()
+        cp.write(f)
+        return f.getvalue(), snapshot_hosts
+
+    @staticmethod
+    def save_host_to_ini(cp, section, host, pwd="", encrypted_password=None):
         if pwd == "":
             pwd = get_password()
+        if encrypted_password is None:
+            encrypted_password = host.get_encrypted_password(pwd)
         cp.set(section, "group", host.group)
         cp.set(section, "name", host.name)
         cp.set(section, "description", host.description)
         cp.set(section, "host", host.host)
         cp.set(section, "user", host.user)
-        cp.set(section, "pass", encrypt(pwd, host.password))
+        cp.set(section, "pass", encrypted_password)
         cp.set(section, "private_key", host.private_key)
         cp.set(section, "port", host.port)
         cp.set(section, "tunnel", host.tunnel_as_string())
@@ -3195,6 +4362,728 @@ class HostUtils:
         cp.set(section, "term", host.term)
 
 
+@contextlib.contextmanager
+def config_lock():
+    """Exclusive advisory lock on gcm.conf and its journal.
+
+    Taken by every running instance and thread before reading-modifying-
+    writing them, through gcm.conf.lock since gcm.conf itself is replaced
+    on every write.
+    """
+    fd = os.open(CONFIG_FILE + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+class ConfigJournal:
+    """Append-only log of changes made since gcm.conf was last written in full.
+
+    Every line is a JSON record: a host upsert ("host"), a host removal
+    ("delete") or the new contents of a settings section ("section").
+    Records are replayed on top of gcm.conf when it is loaded, and the
+    journal is removed once writeConfig compacts everything into gcm.conf.
+    """
+
+    @staticmethod
+    def path():
+        return Path(CONFIG_FILE + ".journal")
+
+    @staticmethod
+    def host_record(host, old=None):
+        cp = configparser.RawConfigParser()
+        cp.add_section("host")
+        HostUtils.save_host_to_ini(cp, "host", host)
+        record = ConfigJournal.section_record(cp, "host")
+        record.update({"op": "host", "group": host.group, "name": host.name, "old": old})
+        return record
+
+    @staticmethod
+    def section_record(cp, section):
+        # same text cp.write() would put in gcm.conf
+        values = {name: str(value) for name, value in cp.items(section)}
+        return {"op": "section", "section": section, "values": values}
+
+    @staticmethod
+    def append(records):
+        path = ConfigJournal.path()
+        with config_lock(), os.fdopen(
+            os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600), "a"
+        ) as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def clear():
+        """Remove the journal, the caller holds config_lock()."""
+        with contextlib.suppress(FileNotFoundError):
+            ConfigJournal.path().unlink()
+
+    @staticmethod
+    def read():
+        try:
+            lines = ConfigJournal.path().read_text().splitlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # a write interrupted by a crash only leaves a partial last line
+                logger.warning("Ignoring invalid journal entry: %r", line)
+        return records
+
+    @staticmethod
+    def replay(cp):
+        """Apply the journal to the parsed gcm.conf and return the number of records."""
+        records = ConfigJournal.read()
+        if not records:
+            return 0
+        sections = {}
+        last = 0
+        for section in cp.sections():
+            if section.startswith("host "):
+                with contextlib.suppress(configparser.Error):
+                    sections[(cp.get(section, "group"), cp.get(section, "name"))] = section
+                with contextlib.suppress(ValueError):
+                    last = max(last, int(section[5:]))
+        for record in records:
+            op = record.get("op")
+            if op == "section":
+                cp.remove_section(record["section"])
+                cp.add_section(record["section"])
+                for name, value in record["values"].items():
+                    cp.set(record["section"], name, value)
+            elif op == "host":
+                key = (record["group"], record["name"])
+                section = sections.pop(tuple(record["old"]), None) if record["old"] else None
+                section = section or sections.get(key)
+                if section is None:
+                    last += 1
+                    section = f"host {last}"
+                    cp.add_section(section)
+                for name in cp.options(section):
+                    cp.remove_option(section, name)
+                for name, value in record["values"].items():
+                    cp.set(section, name, value)
+                sections[key] = section
+            elif op == "delete":
+                section = sections.pop((record["group"], record["name"]), None)
+                if section is not None:
+                    cp.remove_section(section)
+        return len(records)
+
+
+class ConfigSnapshot:
+    """Already parsed copy of gcm.conf and its journal, kept in gcm.cache.
+
+    The snapshot is written with marshal and holds the settings sections and,
+    for every host, its constructor arguments and password ciphertext (never
+    the key). It is only used while gcm.conf and the journal still have the
+    modification time, size and SHA-256 recorded in it.
+
+    marshal is not safe against malicious data, so the cache is trusted as
+    much as gcm.conf itself, whose commands are run in the terminals: it is
+    created readable and writable by the user only.
+    """
+
+    FORMAT = 1
+
+    @staticmethod
+    def path():
+        return Path(CONFIG_FILE).with_name("gcm.cache")
+
+    @staticmethod
+    def source_key():
+        key = []
+        for path in (Path(CONFIG_FILE), ConfigJournal.path()):
+            try:
+                stat = path.stat()
+                digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            except FileNotFoundError:
+                key.append(None)
+            else:
+                key.append((stat.st_mtime_ns, stat.st_size, digest))
+        return tuple(key)
+
+    @staticmethod
+    def load(source):
+        """Return the snapshot if it was taken from the files described by source."""
+        try:
+            data = marshal.loads(ConfigSnapshot.path().read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError):
+            logger.warning("Ignoring unreadable config cache %s", ConfigSnapshot.path())
+            return None
+        if (
+            not isinstance(data, dict)
+            or data.get("format") != ConfigSnapshot.FORMAT
+            or data.get("source") != source
+        ):
+            return None
+        return data
+
+    @staticmethod
+    def load_hosts(snapshot):
+        pwd = get_password()
+        hosts = {}
+        for args, ciphertext in snapshot["hosts"]:
+            host = Host(*args)
+            host.set_encrypted_password(pwd, ciphertext)
+            hosts.setdefault(host.group, []).append(host)
+        return HostUtils.sort_groups(hosts)
+
+    @staticmethod
+    def save(source, cp, hosts, journal_records):
+        """Store the settings sections of cp and hosts, a list of (args, ciphertext)."""
+        data = {
+            "format": ConfigSnapshot.FORMAT,
+            "source": source,
+            "settings": {
+                section: {name: str(value) for name, value in cp.items(section)}
+                for section in cp.sections()
+                if not section.startswith("host ")
+            },
+            "hosts": hosts,
+            "journal_records": journal_records,
+        }
+        path = ConfigSnapshot.path()
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+                marshal.dump(data, f)
+            tmp.replace(path)
+        except (OSError, ValueError) as e:
+            # la cache es opcional, la proxima vez se lee gcm.conf
+            logger.warning("Unable to write config cache: %s", e)
+
+
+class SqliteHostStore:
+    """Hosts kept in an SQLite database next to gcm.conf, one row per host.
+
+    Rows are keyed by group and name, so adding, editing or deleting a host
+    touches a single row. Besides the indexed columns a row holds the Host
+    constructor arguments as JSON and the encrypted password.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hosts (
+            id INTEGER PRIMARY KEY,
+            grp TEXT NOT NULL,
+            name TEXT NOT NULL,
+            host TEXT,
+            description TEXT,
+            args TEXT NOT NULL,
+            pass TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS hosts_group_name ON hosts (grp, name);
+        CREATE INDEX IF NOT EXISTS hosts_name ON hosts (name);
+        CREATE INDEX IF NOT EXISTS hosts_host ON hosts (host);
+        CREATE INDEX IF NOT EXISTS hosts_description ON hosts (description);
+    """
+
+    INSERT = (
+        "INSERT INTO hosts (grp, name, host, description, args, pass) VALUES (?, ?, ?, ?, ?, ?)"
+    )
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def exists(self):
+        return self.path.exists()
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Connection whose statements run in one transaction."""
+        if not self.path.exists():
+            # contiene las claves encriptadas, igual que gcm.conf
+            os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600))
+        db = sqlite3.connect(self.path)
+        try:
+            db.executescript(self.SCHEMA)
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def row(host, pwd):
+        return (
+            host.group,
+            host.name,
+            host.host,
+            host.description,
+            json.dumps(host.to_args()),
+            host.get_encrypted_password(pwd),
+        )
+
+    def load(self):
+        pwd = get_password()
+        hosts = {}
+        with self.connect() as db:
+            for args, ciphertext in db.execute("SELECT args, pass FROM hosts ORDER BY grp, name"):
+                host = Host(*json.loads(args))
+                host.set_encrypted_password(pwd, ciphertext)
+                hosts.setdefault(host.group, []).append(host)
+        return hosts
+
+    def save_all(self, hosts):
+        pwd = get_password()
+        with cipher_cache(), self.connect() as db:
+            db.execute("DELETE FROM hosts")
+            db.executemany(
+                self.INSERT,
+                [self.row(host, pwd) for grupo in hosts for host in hosts[grupo]],
+            )
+
+    def save_host(self, host, old_group=None, old_name=None):
+        row = self.row(host, get_password())
+        key = (old_group, old_name) if old_group is not None else (host.group, host.name)
+        with self.connect() as db:
+            cursor = db.execute(
+                "UPDATE hosts SET grp = ?, name = ?, host = ?, description = ?, args = ?, pass = ?"
+                " WHERE grp = ? AND name = ?",
+                row + key,
+            )
+            if cursor.rowcount == 0:
+                db.execute(self.INSERT, row)
+
+    def delete_hosts(self, hosts):
+        with self.connect() as db:
+            db.executemany(
+                "DELETE FROM hosts WHERE grp = ? AND name = ?",
+                [(host.group, host.name) for host in hosts],
+            )
+
+
+class HostInventory:
+    """Changes to groups that the tree and the servers menu follow.
+
+    Subscribers are called as callback(event, host, old) after groups was
+    changed. event is "add", "remove", "update" (old replaced by host, same
+    group and name) or "move" (old replaced by host in another group or
+    with another name). The hosts of each group are kept sorted by name.
+
+    The hosts are also indexed by (group, name) and by address. A group is
+    indexed the first time it is looked up, so group files are only read
+    when needed, and the indexes start over when groups is replaced.
+    """
+
+    def __init__(self):
+        self.subscribers = []
+        self.indexed = None
+        self.indexed_groups = set()
+        self.names = {}
+        self.addresses = {}
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def emit(self, event, host, old=None):
+        for callback in self.subscribers:
+            callback(event, host, old)
+
+    def add(self, host):
+        self.insert(host)
+        self.emit("add", host)
+
+    def remove(self, host):
+        self.discard(host)
+        self.emit("remove", host)
+
+    def replace(self, old, host):
+        same = (old.group, old.name) == (host.group, host.name)
+        if same:
+            hosts = groups[old.group]
+            hosts[self.locate(hosts, old)] = host
+            self.unindex_host(old)
+            self.index_host(host)
+        else:
+            self.discard(old)
+            self.insert(host)
+        self.emit("update" if same else "move", host, old)
+
+    def insert(self, host):
+        hosts = groups.setdefault(host.group, [])
+        # despues de los hosts con el mismo nombre
+        index = self.position(hosts, host.name)
+        while index < len(hosts) and hosts[index].name == host.name:
+            index += 1
+        hosts.insert(index, host)
+        self.index_host(host)
+
+    def discard(self, host):
+        hosts = groups[host.group]
+        del hosts[self.locate(hosts, host)]
+        if not hosts:
+            del groups[host.group]
+        self.unindex_host(host)
+
+    @staticmethod
+    def position(hosts, name):
+        """Return the index of the first host of hosts, sorted by name, not before name."""
+        lo, hi = 0, len(hosts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if hosts[mid].name < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def locate(self, hosts, host):
+        index = self.position(hosts, host.name)
+        while index < len(hosts) and hosts[index].name == host.name:
+            if hosts[index] is host:
+                return index
+            index += 1
+        # lista sin ordenar
+        return hosts.index(host)
+
+    def invalidate_index(self):
+        """Forget the indexes, after groups was changed without the inventory."""
+        self.indexed = None
+
+    def index_group(self, group):
+        if self.indexed is not groups:
+            self.indexed = groups
+            self.indexed_groups = set()
+            self.names = {}
+            self.addresses = {}
+        if group in self.indexed_groups or group not in groups:
+            return
+        self.indexed_groups.add(group)
+        for host in groups[group]:
+            self.names[(host.group, host.name)] = host
+            self.addresses.setdefault(host.host, []).append(host)
+
+    def index_host(self, host):
+        if self.indexed is groups and host.group in self.indexed_groups:
+            self.names[(host.group, host.name)] = host
+            self.addresses.setdefault(host.host, []).append(host)
+
+    def unindex_host(self, host):
+        if self.indexed is not groups or host.group not in self.indexed_groups:
+            return
+        if self.names.get((host.group, host.name)) is host:
+            del self.names[(host.group, host.name)]
+        hosts = self.addresses.get(host.host, [])
+        if host in hosts:
+            hosts.remove(host)
+            if not hosts:
+                del self.addresses[host.host]
+
+    def find(self, group, name):
+        """Return the host named name in group, None if there is none."""
+        self.index_group(group)
+        return self.names.get((group, name))
+
+    def find_address(self, address):
+        """Return the hosts that connect to address, sorted by group and name."""
+        for group in list(groups):
+            self.index_group(group)
+        return sorted(self.addresses.get(address, []), key=lambda h: (h.group, h.name))
+
+    def match(self, pattern):
+        """Return the hosts whose "group/name" or address matches the glob pattern."""
+        for group in list(groups):
+            self.index_group(group)
+        return [
+            host
+            for key, host in sorted(self.names.items())
+            if fnmatch.fnmatchcase(f"{key[0]}/{key[1]}", pattern)
+            or fnmatch.fnmatchcase(host.host or "", pattern)
+        ]
+
+
+inventory = HostInventory()
+
+
+class HostSearchIndex:
+    """Trigram index over the name, address, user, description and group of hosts.
+
+    search() only compares the text of the hosts that have every trigram of
+    the query, rank() also finds the hosts sharing part of them.
+    """
+
+    def __init__(self, hosts=()):
+        self.texts = {}
+        self.trigrams = {}
+        # orden en que se agregaron los hosts, para listar los resultados
+        self.positions = {}
+        self.added = 0
+        for host in hosts:
+            self.add(host)
+
+    @staticmethod
+    def host_text(host):
+        # cada campo empieza con "\n", para encontrar las palabras al principio de un campo
+        return "".join(
+            "\n" + (value or "")
+            for value in (host.name, host.host, host.user, host.description, host.group)
+        ).lower()
+
+    def add(self, host):
+        text = self.host_text(host)
+        self.texts[host] = text
+        self.positions[host] = self.added
+        self.added += 1
+        for trigram in {text[i : i + 3] for i in range(len(text) - 2)}:
+            self.trigrams.setdefault(trigram, set()).add(host)
+
+    def remove(self, host):
+        text = self.texts.pop(host, None)
+        if text is None:
+            return
+        del self.positions[host]
+        for trigram in {text[i : i + 3] for i in range(len(text) - 2)}:
+            self.trigrams[trigram].discard(host)
+
+    def search(self, query, candidates=None):
+        """Return the hosts whose text contains query, looking only at candidates if given."""
+        query = query.lower()
+        if candidates is None:
+            if len(query) < 3:
+                candidates = self.texts
+            else:
+                found = sorted(
+                    (self.trigrams.get(query[i : i + 3], set()) for i in range(len(query) - 2)),
+                    key=len,
+                )
+                candidates = found[0].intersection(*found[1:])
+        return {host for host in candidates if query in self.texts[host]}
+
+    def rank(self, query, limit, recent):
+        """Return up to limit hosts matching every word of query, best first.
+
+        Hosts with a field starting with the first word come first, then the
+        ones containing every word and last the ones sharing a third of the
+        trigrams of each word, for typos. recent maps hosts to the time they
+        were last used, the most recent go first within each of those.
+        """
+        words = query.lower().split()
+        if not words:
+            # sin texto, los ultimos usados
+            return self.best(None, limit, recent, lambda host: True)
+
+        def matches(host):
+            text = self.texts[host]
+            return all(word in text for word in words)
+
+        candidates = self.candidates(words, None)
+        start = "\n" + words[0]
+        ranked = self.best(
+            # los otros trigramas ya estan en candidates
+            self.candidates([start[:3]], candidates),
+            limit,
+            recent,
+            lambda host: start in self.texts[host] and matches(host),
+        )
+        taken = set(ranked)
+        ranked += self.best(
+            candidates,
+            limit - len(ranked),
+            recent,
+            lambda host: host not in taken and matches(host),
+        )
+        if len(ranked) < limit:
+            scores = self.fuzzy_scores(words)
+            for host in ranked:
+                scores.pop(host, None)
+            ranked += heapq.nlargest(
+                limit - len(ranked), scores, key=lambda h: (scores[h], recent.get(h, 0))
+            )
+        return ranked
+
+    def candidates(self, words, hosts):
+        """Narrow hosts, every host if None, to the ones with every trigram of words."""
+        for word in words:
+            for i in range(len(word) - 2):
+                found = self.trigrams.get(word[i : i + 3], set())
+                if len(found) == len(self.texts):
+                    # lo tienen todos, no descarta nada
+                    continue
+                hosts = found if hosts is None else hosts & found
+        return hosts
+
+    def best(self, hosts, limit, recent, accept):
+        """Return up to limit accepted hosts, the recently used first and the rest in index order."""
+        if limit <= 0:
+            return []
+        used = sorted(recent, key=recent.get, reverse=True)
+        ranked = [
+            h for h in used if (hosts is None or h in hosts) and h in self.texts and accept(h)
+        ]
+        ranked = ranked[:limit]
+        if len(ranked) < limit:
+            if hosts is None:
+                ordered = self.texts
+            elif len(hosts) * 10 < len(self.texts):
+                ordered = sorted(hosts, key=self.positions.get)
+            else:
+                # muchos candidatos, alcanza con recorrer los primeros
+                ordered = (h for h in self.texts if h in hosts)
+            rest = (h for h in ordered if h not in recent and accept(h))
+            ranked += itertools.islice(rest, limit - len(ranked))
+        return ranked
+
+    def fuzzy_scores(self, words):
+        """Return the share of the trigrams of words each host has, if it has a third of every word."""
+        scores = None
+        # las palabras largas primero, las cortas solo se buscan entre lo que quede
+        for word in sorted(words, key=len, reverse=True):
+            if len(word) < 3:
+                word_scores = dict.fromkeys(self.search(word, scores), 1)
+            else:
+                found = sorted(
+                    (self.trigrams.get(word[i : i + 3], set()) for i in range(len(word) - 2)),
+                    key=len,
+                )
+                needed = -(-len(found) // 3)
+                # un host con needed trigramas tiene alguno de los len(found) - needed + 1 menos comunes
+                candidates = set().union(*found[: len(found) - needed + 1])
+                if scores is not None:
+                    candidates.intersection_update(scores)
+                if len(candidates) > FUZZY_CANDIDATES:
+                    # trigramas demasiado comunes para buscar errores
+                    return {}
+                counts = collections.Counter()
+                for hosts in found:
+                    counts.update(hosts & candidates)
+                word_scores = {
+                    host: count / len(found) for host, count in counts.items() if count >= needed
+                }
+            if scores is not None:
+                word_scores = {host: scores[host] + score for host, score in word_scores.items()}
+            scores = word_scores
+            if not scores:
+                break
+        return scores
+
+
+class LazyGroups(dict):
+    """groups dict whose host lists are read from their group file on first access.
+
+    Iterating or testing membership only uses the group names, so the tree
+    can be built without reading any file.
+    """
+
+    def __init__(self, store, names):
+        super().__init__(dict.fromkeys(names))
+        self.store = store
+        # called with the group and its hosts after reading its file
+        self.on_load = None
+
+    def is_loaded(self, group):
+        return super().get(group) is not None
+
+    def __getitem__(self, group):
+        hosts = super().__getitem__(group)
+        if hosts is None:
+            hosts = self.store.load_group(group)
+            self[group] = hosts
+            if self.on_load is not None:
+                self.on_load(group, hosts)
+        return hosts
+
+    def get(self, group, default=None):
+        if group not in self:
+            return default
+        return self[group]
+
+    def setdefault(self, group, default=None):
+        if group not in self:
+            self[group] = default
+        return self[group]
+
+    def pop(self, group, *default):
+        if group not in self:
+            return super().pop(group, *default)
+        hosts = self[group]
+        del self[group]
+        return hosts
+
+    def values(self):
+        return [self[group] for group in self]
+
+    def items(self):
+        return [(group, self[group]) for group in self]
+
+
+class GroupFilesHostStore:
+    """Hosts kept in one INI file per group under hosts.d next to gcm.conf.
+
+    Loading only lists the directory, each file is read when its group is
+    first used. Saving a host rewrites the files of the groups it touches.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def exists(self):
+        return self.path.is_dir()
+
+    def group_file(self, group):
+        name = quote(group, safe="")
+        if name.startswith("."):
+            # glob no lista archivos ocultos
+            name = "%2E" + name[1:]
+        return self.path / (name + ".conf")
+
+    def load(self):
+        return LazyGroups(self, sorted(unquote(f.stem) for f in self.path.glob("*.conf")))
+
+    def load_group(self, group):
+        cp = configparser.RawConfigParser()
+        cp.read(self.group_file(group))
+        hosts = []
+        with cipher_cache():
+            for section in cp.sections():
+                if not section.startswith("host "):
+                    continue
+                try:
+                    hosts.append(HostUtils.load_host_from_ini(cp, section))
+                except (configparser.Error, ValueError, AttributeError) as e:
+                    logger.error("%s: %s", _("Entrada invalida en archivo de configuracion"), e)
+        hosts.sort(key=operator.attrgetter("name"))
+        return hosts
+
+    def save_group(self, group, hosts):
+        path = self.group_file(group)
+        if not hosts:
+            path.unlink(missing_ok=True)
+            return
+        cp = configparser.RawConfigParser()
+        HostUtils.save_hosts_to_ini(cp, hosts)
+        tmp = path.with_name(path.name + ".tmp")
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            cp.write(f)
+        tmp.replace(path)
+
+    def save_all(self, hosts):
+        self.path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with cipher_cache():
+            for group in hosts:
+                self.save_group(group, hosts[group])
+        for path in self.path.glob("*.conf"):
+            if unquote(path.stem) not in hosts:
+                path.unlink()
+
+    def save_host(self, host, old_group=None, old_name=None):
+        for group in {host.group, old_group} - {None}:
+            self.save_group(group, groups.get(group, []))
+
+    def delete_hosts(self, hosts):
+        for group in {host.group for host in hosts}:
+            self.save_group(group, groups.get(group, []))
+
+
 class Whost(GladeComponent):
     def __init__(
         self, path="gnome-connection-manager.glade", root="wHost", domain=domain_name, **kwargs
@@ -3444,87 +5333,61 @@ class Whost(GladeComponent):
         term = self.txtTerm.get_text()
 
         host = Host(
-            group,
-            name,
-            description,
-            host,
-            user,
-            password,
-            private_key,
-            port,
-            tunnel,
-            ctype,
-            commands,
-            keepalive,
-            fcolor,
-            bcolor,
-            x11,
-            agent,
-            compression,
-            compressionLevel,
-            extra_params,
-            log,
-            backspace_key,
-            delete_key,
-            term,
+            group=group,
+            name=name,
+            description=description,
+            host=host,
+            user=user,
+            password=password,
+            private_key=private_key,
+            port=port,
+            tunnel=tunnel,
+            type=ctype,
+            commands=commands,
+            keep_alive=keepalive,
+            font_color=fcolor,
+            back_color=bcolor,
+            x11=x11,
+            agent=agent,
+            compression=compression,
+            compressionLevel=compressionLevel,
+            extra_params=extra_params,
+            log=log,
+            backspace_key=backspace_key,
+            delete_key=delete_key,
+            term=term,
         )
 
         try:
             # Guardar
-            if group not in groups:  # not groups.has_key(group):
-                groups[group] = []
+            # revisar que no este el nombre en el grupo
+            renamed = self.isNew or self.oldGroup != group or self.oldName != name
+            if renamed and inventory.find(group, name) is not None:
+                msgbox(
+                    "{} [{}] {} [{}]".format(
+                        _("El nombre"), name, _("ya existe para el grupo"), group
+                    )
+                )
+                return
 
             if self.isNew:
-                for h in groups[group]:
-                    if h.name == name:
-                        msgbox(
-                            "{} [{}] {} [{}]".format(_("El nombre"), name, _("ya existe para el grupo"), group)
-                        )
-                        return
                 # agregar host a grupo
-                groups[group].append(host)
+                inventory.add(host)
             else:
-                if self.oldGroup != group:
-                    # revisar que no este el nombre en el nuevo grupo
-                    if group not in groups:  # if not groups.has_key(group):
-                        groups[group] = [host]
-                    else:
-                        for h in groups[group]:
-                            if h.name == name:
-                                msgbox(
-                                    "{} [{}] {} [{}]".format(_("El nombre"), name, _("ya existe para el grupo"), group)
-                                )
-                                return
-                        groups[group].append(host)
-                        for h in groups[self.oldGroup]:
-                            if h.name == self.oldName:
-                                groups[self.oldGroup].remove(h)
-                                break
-                else:
-                    if self.oldName != name:
-                        for h in groups[self.oldGroup]:
-                            if h.name == name:
-                                msgbox(
-                                    "{} [{}] {} [{}]".format(_("El nombre"), name, _("ya existe para el grupo"), group)
-                                )
-                                return
-                        for h in groups[self.oldGroup]:
-                            if h.name == self.oldName:
-                                index = groups[self.oldGroup].index(h)
-                                groups[self.oldGroup][index] = host
-                                break
-                    else:
-                        for h in groups[self.oldGroup]:
-                            if h.name == self.oldName:
-                                index = groups[self.oldGroup].index(h)
-                                groups[self.oldGroup][index] = host
-                                break
+                old = inventory.find(self.oldGroup, self.oldName)
+                if old is None:
+                    raise KeyError(self.oldName)
+                if (old.font_color, old.back_color) != (host.font_color, host.back_color):
+                    clear_terminal_styles()
+                inventory.replace(old, host)
         except (KeyError, ValueError, IndexError) as e:
             msgbox(f"{_('Error al guardar el host. Descripcion')} [{e}]")
 
         global wMain
-        wMain.updateTree()
-        wMain.writeConfig()
+        if self.isNew:
+            wMain.save_host(host)
+        else:
+            wMain.save_host(host, self.oldGroup, self.oldName)
 
         self.get_widget("wHost").destroy()
 
@@ -3744,6 +5607,21 @@ class Wconfig(GladeComponent):
         )
         self.addParam(_("Título dinámico"), "conf.UPDATE_TITLE", bool)
         self.addParam(_("Título"), "conf.APP_TITLE", str)
+        self.addParam(
+            _("Guardar cambios en un diario y reescribir la configuración al salir"),
+            "conf.JOURNAL",
+            bool,
+        )
+        self.addParam(
+            _("Guardar hosts en"),
+            "conf.HOSTS_STORAGE",
+            list,
+            [
+                "gcm.conf",
+                _("Base de datos SQLite (hosts.db)"),
+                _("Un archivo por grupo (hosts.d)"),
+            ],
+        )
 
         if len(conf.FONT_COLOR) == 0:
             self.chkDefaultColors.set_active(True)
@@ -3948,6 +5826,8 @@ class Wconfig(GladeComponent):
 
     # -- Wconfig.on_okbutton1_clicked {
     def on_okbutton1_clicked(self, widget, *args):
+        hosts_storage = conf.HOSTS_STORAGE
+        terminal_style = (conf.FONT, conf.FONT_COLOR, conf.BACK_COLOR, conf.TRANSPARENCY)
         for obj in self.tblGeneral:
             if hasattr(obj, "field"):
                 if isinstance(obj, Gtk.CheckButton):
@@ -3975,6 +5855,9 @@ class Wconfig(GladeComponent):
         else:
             conf.FONT = ""
 
+        if terminal_style != (conf.FONT, conf.FONT_COLOR, conf.BACK_COLOR, conf.TRANSPARENCY):
+            clear_terminal_styles()
+
         # Guardar shortcuts
         scuts = {}
         for x in self.treeModel:
@@ -3994,11 +5877,15 @@ class Wconfig(GladeComponent):
             wMain.get_widget("btnDonate").show()
 
         # Update servers window colors
-        wMain.updateTree()
+        wMain.update_row_color()
 
         # Recrear menu de comandos personalizados
         wMain.populateCommandsMenu()
-        wMain.writeConfig()
+        if hosts_storage != conf.HOSTS_STORAGE:
+            # mover los hosts al almacenamiento elegido
+            wMain.save_all_hosts()
+        else:
+            wMain.save_settings()
 
         self.get_widget("wConfig").destroy()
 
@@ -4395,6 +6282,61 @@ class EntryDialog(Gtk.Dialog):
         self.response(Gtk.ResponseType.OK)
 
 
+class QuickConnectDialog(Gtk.Dialog):
+    """Palette that opens a session on the host picked by typing part of its name."""
+
+    def __init__(self, controller, parent=None):
+        Gtk.Dialog.__init__(self, transient_for=parent)
+        self.controller = controller
+        self.set_title(_("Quick Connect"))
+        self.set_modal(True)
+        self.set_default_size(500, 400)
+        self.entry = Gtk.SearchEntry()
+        self.entry.connect("search-changed", self.on_search_changed)
+        self.entry.connect("activate", self.on_activate)
+        self.entry.connect("stop-search", lambda entry: self.destroy())
+        self.entry.connect("key-press-event", self.on_entry_key_press)
+        self.model = Gtk.ListStore(str, GObject.TYPE_PYOBJECT)
+        self.list = Gtk.TreeView(model=self.model)
+        self.list.set_headers_visible(False)
+        self.list.append_column(Gtk.TreeViewColumn(None, Gtk.CellRendererText(), text=0))
+        self.list.connect("row-activated", lambda *args: self.on_activate(None))
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.add(self.list)
+        box = self.get_content_area()
+        box.pack_start(self.entry, False, False, 0)
+        box.pack_start(scrolled, True, True, 0)
+        box.show_all()
+        self.entry.grab_focus()
+        self.on_search_changed(self.entry)
+
+    def on_search_changed(self, entry):
+        self.model.clear()
+        for host in self.controller.quick_connect_hosts(entry.get_text()):
+            self.model.append([f"{host.group}/{host.name}  {host.user}@{host.host}", host])
+        if len(self.model):
+            self.list.set_cursor(Gtk.TreePath.new_first())
+
+    def on_entry_key_press(self, entry, event):
+        # las flechas mueven la seleccion sin dejar de escribir
+        if event.keyval not in (Gdk.KEY_Up, Gdk.KEY_Down) or not len(self.model):
+            return False
+        path, _column = self.list.get_cursor()
+        row = path.get_indices()[0] if path is not None else 0
+        row += -1 if event.keyval == Gdk.KEY_Up else 1
+        row = min(max(row, 0), len(self.model) - 1)
+        self.list.set_cursor(Gtk.TreePath.new_from_indices([row]))
+        return True
+
+    def on_activate(self, widget):
+        model, selected = self.list.get_selection().get_selected()
+        if selected is None:
+            return
+        host = model.get_value(selected, 1)
+        self.destroy()
+        self.controller.addTab(self.controller.nbConsole, host)
+
+
 class CellTextView(Gtk.TextView, Gtk.CellEditable):
     __gtype_name__ = "CellTextView"
 
@@ -4523,6 +6465,129 @@ class CheckUpdates(Thread):
             pass
 
 
+class ConfigWriter(Thread):
+    """Write gcm.conf outside the GTK main loop.
+
+    Jobs scheduled within DELAY seconds of each other are coalesced into
+    the last one, they take config_lock() themselves around reading and
+    replacing gcm.conf. write() skips text that matches the file and fsyncs
+    the new file before it replaces the old one. flush() blocks until every
+    scheduled job is done.
+    """
+
+    DELAY = 0.5
+
+    def __init__(self):
+        Thread.__init__(self, daemon=True)
+        self.condition = Condition()
+        self.pending = None
+        self.deadline = 0
+        self.busy = False
+
+    def schedule(self, job, replace=True):
+        """Run job() in the writer thread, replacing the pending job unless replace is False."""
+        with self.condition:
+            if self.pending is None:
+                self.deadline = time.monotonic() + self.DELAY
+                self.pending = job
+            elif replace:
+                self.pending = job
+            if self.ident is None:
+                self.start()
+            self.condition.notify_all()
+
+    def flush(self):
+        with self.condition:
+            self.deadline = 0
+            self.condition.notify_all()
+            while self.pending is not None or self.busy:
+                self.condition.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None or time.monotonic() < self.deadline:
+                    timeout = None if self.pending is None else self.deadline - time.monotonic()
+                    self.condition.wait(timeout)
+                job, self.pending = self.pending, None
+                self.busy = True
+            try:
+                job()
+            except OSError as e:
+                logger.error("Unable to write %s: %s", CONFIG_FILE, e)
+                GLib.idle_add(msgbox, f"{_('No se puede escribir')} {CONFIG_FILE}: {e}")
+            except Exception:
+                logger.exception("Config writer job failed")
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    def write(self, path, text):
+        path = Path(path)
+        # se compara con el archivo, otra instancia puede haberlo reescrito
+        with contextlib.suppress(OSError):
+            if path.read_text() == text:
+                return
+        tmp = Path(str(path) + ".tmp")
+        with tmp.open("w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(path)
+
+
+class BackgroundTask(Thread):
+    """Run work(chunk) for every chunk outside the GTK main loop.
+
+    finish(results) also runs in the thread once every chunk is done.
+    on_progress(done, total) and on_done(result, error) are called from the
+    main loop through GLib.idle_add, and are not called once cancel() has been
+    requested. Cancelling takes effect between chunks; finish can check the
+    cancelled event it was created with before a step that cannot be undone.
+    """
+
+    def __init__(self, chunks, work, finish, on_progress, on_done, cancelled=None):
+        Thread.__init__(self, daemon=True)
+        self.chunks = chunks
+        self.work = work
+        self.finish = finish
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.cancelled = cancelled if cancelled is not None else Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        results = []
+        try:
+            with cipher_cache():
+                for chunk in self.chunks:
+                    if self.cancelled.is_set():
+                        return
+                    results.append(self.work(chunk))
+                    GLib.idle_add(self.report_progress, len(results))
+                if self.cancelled.is_set():
+                    return
+                result = self.finish(results) if self.finish else results
+        except Exception as e:
+            logger.exception("Background task failed")
+            GLib.idle_add(self.report_done, None, e)
+            return
+        GLib.idle_add(self.report_done, result, None)
+
+    def report_progress(self, done):
+        if not self.cancelled.is_set():
+            self.on_progress(done, len(self.chunks))
+        return False
+
+    def report_done(self, result, error):
+        if not self.cancelled.is_set():
+            self.on_done(result, error)
+        return False
+
+
 class GcmApplication(Gtk.Application):
     """GtkApplication bootstrap that owns the main window."""
 
@@ -4539,6 +6604,7 @@ class GcmApplication(Gtk.Application):
         self._create_action("quit", self._on_action_quit, ["<Primary>q"])
         self._create_action("new-local", self._on_action_new_local, ["<Primary><Shift>n"])
         self._create_action("connect", self._on_action_connect, ["<Primary>Return"])
+        self._create_action("quick-connect", self._on_action_quick_connect, ["<Primary><Shift>p"])
         self._create_action("add-host", self._on_action_add_host, ["<Primary>n"])
         self._create_action("edit-host", self._on_action_edit_host, ["<Primary>e"])
         self._create_action("delete", self._on_action_delete_host)
@@ -4635,6 +6701,7 @@ class GcmApplication(Gtk.Application):
         servers_menu = Gio.Menu()
         servers_menu.append(_("New Local Console"), "app.new-local")
         servers_menu.append(_("Connect"), "app.connect")
+        servers_menu.append(_("Quick Connect"), "app.quick-connect")
         servers_menu.append(_("Add Host"), "app.add-host")
         servers_menu.append(_("Edit Host"), "app.edit-host")
         servers_menu.append(_("Delete Host"), "app.delete")
@@ -4675,6 +6742,10 @@ class GcmApplication(Gtk.Application):
         if self._controller is not None:
             self._controller.on_btnConnect_clicked(None)
 
+    def _on_action_quick_connect(self, action, _param):
+        if self._controller is not None:
+            self._controller.show_quick_connect()
+
     def _on_action_add_host(self, action, _param):
         if self._controller is not None:
             self._controller.on_btnAdd_clicked(None)
@@ -178,8 +178,12 @@ def test_write_config_persists_conf_window_hosts_and_shortcuts(tmp_path, app_mod
     wmain.hpMain = hp_stub
     wmain.wMain = types.SimpleNamespace(is_maximized=lambda: False)
     wmain.get_collapsed_nodes = lambda: ["0", "2"]
+    wmain.config_writer = app_module.ConfigWriter()
+    wmain.config_source = None
+    wmain.config_base = {}
 
     wmain.writeConfig()
+    wmain.config_writer.flush()
 
     cp = configparser.RawConfigParser()
     cp.read(config_file)
@@ -204,3 +208,435 @@ def test_write_config_persists_conf_window_hosts_and_shortcuts(tmp_path, app_mod
     assert cp.get("host 1", "host") == "router.example.com"
     assert cp.get("host 1", "pass") == "secret"
     assert cp.get("host 1", "commands") == "echo hello\\nrun-checks"
+
+
+def make_wmain_for_write(app_module):
+    wmain = object.__new__(app_module.Wmain)
+    wmain.hpMain = types.SimpleNamespace(get_position=lambda: 150)
+    wmain.wMain = types.SimpleNamespace(is_maximized=lambda: False)
+    wmain.get_collapsed_nodes = lambda: []
+    wmain.journal_records = 0
+    wmain.config_writer = app_module.ConfigWriter()
+    wmain.config_source = None
+    wmain.config_base = {}
+    return wmain
+
+
+def test_journal_records_host_changes_and_replays_them(tmp_path, app_module, monkeypatch):
+    config_file = tmp_path / "gcm.conf"
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(config_file))
+    monkeypatch.setattr(app_module, "encrypt", lambda _pwd, value: value)
+    monkeypatch.setattr(app_module, "decrypt", lambda _pwd, value: value)
+    monkeypatch.setattr(app_module.conf, "JOURNAL", True)
+    monkeypatch.setattr(app_module.conf, "VERSION", "1")
+    monkeypatch.setattr(app_module, "shortcuts", {})
+
+    first = make_host(app_module)
+    second = make_host(app_module)
+    second.name = "switch"
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [first, second]})
+    wmain = make_wmain_for_write(app_module)
+    wmain.writeConfig()
+    wmain.config_writer.flush()
+    written = config_file.read_text()
+
+    renamed = first.clone()
+    renamed.name = "edge"
+    added = make_host(app_module)
+    added.group = "ops/dev"
+    wmain.save_host(renamed, "ops/prod", "router")
+    wmain.save_host(added)
+    wmain.delete_hosts([second])
+    app_module.conf.TRANSPARENCY = 42
+    wmain.save_settings()
+
+    assert config_file.read_text() == written
+    assert wmain.journal_records == 6
+
+    with app_module.ConfigJournal.path().open("a") as f:
+        f.write('{"op": "delete", "gro')
+
+    monkeypatch.setattr(app_module, "groups", {})
+    app_module.conf.TRANSPARENCY = 0
+    loader = object.__new__(app_module.Wmain)
+    loader.loadConfig()
+
+    assert loader.journal_records == 6
+    assert app_module.conf.TRANSPARENCY == 42
+    assert [host.name for host in app_module.groups["ops/prod"]] == ["edge"]
+    assert [host.name for host in app_module.groups["ops/dev"]] == ["router"]
+
+    wmain.writeConfig()
+    wmain.config_writer.flush()
+    assert not app_module.ConfigJournal.path().exists()
+    assert wmain.journal_records == 0
+
+
+def test_journal_compacts_after_too_many_records(tmp_path, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(tmp_path / "gcm.conf"))
+    monkeypatch.setattr(app_module.conf, "JOURNAL", True)
+    monkeypatch.setattr(app_module.conf, "VERSION", "1")
+    monkeypatch.setattr(app_module, "JOURNAL_COMPACT_RECORDS", 3)
+    host = make_host(app_module)
+
+    wmain = object.__new__(app_module.Wmain)
+    wmain.journal_records = 0
+    writes = []
+    wmain.writeConfig = lambda: writes.append(True)
+
+    wmain.delete_hosts([host, host])
+    assert writes == []
+    wmain.delete_hosts([host])
+    assert writes == [True]
+
+
+def test_save_host_rewrites_config_without_journal(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.conf, "JOURNAL", False)
+    wmain = object.__new__(app_module.Wmain)
+    writes = []
+    wmain.writeConfig = lambda: writes.append(True)
+
+    wmain.save_host(make_host(app_module))
+    wmain.save_settings()
+
+    assert writes == [True, True]
+    assert not app_module.ConfigJournal.path().exists()
+
+
+def test_snapshot_cache_skips_parsing_until_config_changes(tmp_path, app_module, monkeypatch):
+    config_file = tmp_path / "gcm.conf"
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(config_file))
+    monkeypatch.setattr(app_module, "encrypt", lambda _pwd, value: f"enc:{value}")
+    monkeypatch.setattr(app_module, "decrypt", lambda _pwd, value: value[4:])
+    monkeypatch.setattr(app_module, "get_password", lambda: "the-key")
+    monkeypatch.setattr(app_module, "shortcuts", {})
+    monkeypatch.setattr(app_module.conf, "VERSION", "1")
+
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [make_host(app_module)]})
+    app_module.conf.BUFFER_LINES = 1234
+    wmain = make_wmain_for_write(app_module)
+    wmain.writeConfig()
+    wmain.config_writer.flush()
+
+    cache = app_module.ConfigSnapshot.path()
+    assert cache.exists()
+    assert b"the-key" not in cache.read_bytes()
+    assert b"enc:secret" in cache.read_bytes()
+
+    parsed = []
+    original_load = app_module.HostUtils.load_host_from_ini
+    monkeypatch.setattr(
+        app_module.HostUtils,
+        "load_host_from_ini",
+        lambda *args: parsed.append(args) or original_load(*args),
+    )
+
+    app_module.conf.BUFFER_LINES = 0
+    monkeypatch.setattr(app_module, "groups", {})
+    object.__new__(app_module.Wmain).loadConfig()
+
+    assert parsed == []
+    assert app_module.conf.BUFFER_LINES == 1234
+    host = app_module.groups["ops/prod"][0]
+    assert host.to_args() == make_host(app_module).to_args()
+    assert host.password == "secret"
+
+    config_file.write_text(config_file.read_text().replace("= 1234", "= 4321"))
+    object.__new__(app_module.Wmain).loadConfig()
+
+    assert len(parsed) == 1
+    assert app_module.conf.BUFFER_LINES == 4321
+    assert app_module.ConfigSnapshot.load(app_module.ConfigSnapshot.source_key()) is not None
+
+
+def test_snapshot_cache_ignores_garbage(tmp_path, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(tmp_path / "gcm.conf"))
+    app_module.ConfigSnapshot.path().write_bytes(b"\x00not marshal")
+
+    assert app_module.ConfigSnapshot.load(app_module.ConfigSnapshot.source_key()) is None
+
+
+def test_sqlite_store_migrates_and_updates_single_hosts(tmp_path, app_module, monkeypatch):
+    config_file = tmp_path / "gcm.conf"
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(config_file))
+    monkeypatch.setattr(app_module, "encrypt", lambda _pwd, value: f"enc:{value}")
+    monkeypatch.setattr(app_module, "decrypt", lambda _pwd, value: value[len("enc:") :])
+    monkeypatch.setattr(app_module.conf, "VERSION", "1")
+    monkeypatch.setattr(app_module.conf, "HOSTS_STORAGE", app_module.HOSTS_STORAGE_INI)
+    monkeypatch.setattr(app_module, "shortcuts", {})
+
+    first = make_host(app_module)
+    second = make_host(app_module)
+    second.name = "switch"
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [first, second]})
+    wmain = make_wmain_for_write(app_module)
+    wmain.writeConfig()
+    wmain.config_writer.flush()
+
+    # al elegir SQLite los hosts de gcm.conf pasan a hosts.db
+    app_module.conf.HOSTS_STORAGE = app_module.HOSTS_STORAGE_SQLITE
+    wmain.save_all_hosts()
+    wmain.config_writer.flush()
+    store = wmain.get_host_store()
+    assert store.path == tmp_path / "hosts.db"
+    monkeypatch.setattr(app_module, "groups", {})
+    wmain.loadConfig()
+    assert [host.name for host in app_module.groups["ops/prod"]] == ["router", "switch"]
+
+    cp = configparser.RawConfigParser()
+    cp.read(config_file)
+    assert cp.getint("options", "hosts-storage") == app_module.HOSTS_STORAGE_SQLITE
+    assert not [section for section in cp.sections() if section.startswith("host ")]
+
+    edited = first.clone()
+    edited.name = "edge"
+    edited.password = "changed"
+    added = make_host(app_module)
+    added.group = "ops/dev"
+    wmain.save_host(edited, "ops/prod", "router")
+    wmain.save_host(added)
+    wmain.delete_hosts([second])
+
+    monkeypatch.setattr(app_module, "groups", {})
+    wmain.loadConfig()
+    assert [host.name for host in app_module.groups["ops/prod"]] == ["edge"]
+    assert app_module.groups["ops/prod"][0].password == "changed"
+    assert [host.name for host in app_module.groups["ops/dev"]] == ["router"]
+
+
+def test_sqlite_store_errors_are_reported_not_raised(tmp_path, app_module, monkeypatch, caplog):
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(tmp_path / "gcm.conf"))
+    monkeypatch.setattr(app_module.conf, "HOSTS_STORAGE", app_module.HOSTS_STORAGE_SQLITE)
+    # un directorio en lugar de la base de datos
+    (tmp_path / "hosts.db").mkdir()
+    messages = []
+    monkeypatch.setattr(app_module, "msgbox", messages.append)
+    wmain = make_wmain_for_write(app_module)
+    host = make_host(app_module)
+
+    wmain.save_host(host)
+    wmain.delete_hosts([host])
+
+    assert [record.levelname for record in caplog.records] == ["ERROR", "ERROR"]
+    assert "hosts.db" in caplog.records[0].getMessage()
+    assert len(messages) == 2
+    assert messages[0].startswith(f"{app_module._('No se puede escribir')} {tmp_path / 'hosts.db'}: ")
+
+
+def test_group_files_are_read_on_demand_and_written_per_group(tmp_path, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(tmp_path / "gcm.conf"))
+    monkeypatch.setattr(app_module.conf, "VERSION", "1")
+    monkeypatch.setattr(app_module.conf, "HOSTS_STORAGE", app_module.HOSTS_STORAGE_GROUP_FILES)
+    monkeypatch.setattr(app_module, "shortcuts", {})
+
+    prod = make_host(app_module)
+    dev = make_host(app_module)
+    dev.group = ".dev"
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [prod], ".dev": [dev]})
+    wmain = make_wmain_for_write(app_module)
+    wmain.save_all_hosts()
+    wmain.config_writer.flush()
+    hosts_dir = tmp_path / "hosts.d"
+    assert sorted(f.name for f in hosts_dir.iterdir()) == ["%2Edev.conf", "ops%2Fprod.conf"]
+
+    monkeypatch.setattr(app_module, "groups", {})
+    wmain.loadConfig()
+    assert sorted(app_module.groups) == [".dev", "ops/prod"]
+    assert not app_module.is_group_loaded("ops/prod")
+    assert app_module.groups["ops/prod"][0].password == "secret"
+    assert app_module.is_group_loaded("ops/prod")
+    assert not app_module.is_group_loaded(".dev")
+
+    written = []
+    save_group = app_module.GroupFilesHostStore.save_group
+    monkeypatch.setattr(
+        app_module.GroupFilesHostStore,
+        "save_group",
+        lambda store, group, hosts: written.append(group) or save_group(store, group, hosts),
+    )
+    moved = app_module.groups["ops/prod"].pop()
+    moved.group = "ops/test"
+    app_module.groups["ops/test"] = [moved]
+    wmain.save_host(moved, "ops/prod", "router")
+
+    assert sorted(written) == ["ops/prod", "ops/test"]
+    assert sorted(f.name for f in hosts_dir.iterdir()) == ["%2Edev.conf", "ops%2Ftest.conf"]
+
+
+def test_reload_config_ignores_own_writes_and_merges_external_changes(
+    tmp_path, app_module, monkeypatch
+):
+    config_file = tmp_path / "gcm.conf"
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(config_file))
+    monkeypatch.setattr(app_module.conf, "HOSTS_STORAGE", app_module.HOSTS_STORAGE_INI)
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda func, *args: func(*args))
+    monkeypatch.setattr(app_module, "shortcuts", {})
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [make_host(app_module)]})
+    wmain = make_wmain_for_write(app_module)
+    patched = []
+    wmain.patch_hosts = patched.append
+    wmain.writeConfig()
+    wmain.config_writer.flush()
+
+    wmain.reload_config()
+    wmain.config_writer.flush()
+    assert patched == []
+
+    cp = configparser.RawConfigParser()
+    cp.read(config_file)
+    cp.set("host 1", "name", "edge")
+    with config_file.open("w") as f:
+        cp.write(f)
+
+    wmain.reload_config()
+    wmain.config_writer.flush()
+    assert [host.name for host in patched[0]["ops/prod"]] == ["edge"]
+    wmain.reload_config()
+    wmain.config_writer.flush()
+    assert len(patched) == 1
+
+
+def test_hosts_merged_from_another_instance_are_sorted(tmp_path, app_module, monkeypatch):
+    config_file = tmp_path / "gcm.conf"
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(config_file))
+    monkeypatch.setattr(app_module.conf, "HOSTS_STORAGE", app_module.HOSTS_STORAGE_INI)
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda func, *args: func(*args))
+    monkeypatch.setattr(app_module, "shortcuts", {})
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [make_host(app_module)]})
+    wmain = make_wmain_for_write(app_module)
+    patched = []
+    wmain.patch_hosts = patched.append
+    wmain.writeConfig()
+    wmain.config_writer.flush()
+
+    # otra instancia agrega un host que va antes que el nuestro
+    cp = configparser.RawConfigParser()
+    cp.read(config_file)
+    cp.add_section("host 2")
+    for name, value in cp.items("host 1"):
+        cp.set("host 2", name, value)
+    cp.set("host 2", "name", "access")
+    with config_file.open("w") as f:
+        cp.write(f)
+
+    wmain.reload_config()
+    wmain.config_writer.flush()
+    assert [host.name for host in patched[0]["ops/prod"]] == ["access", "router"]
+
+
+def test_concurrent_instances_merge_host_changes(tmp_path, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(tmp_path / "gcm.conf"))
+    monkeypatch.setattr(app_module.conf, "HOSTS_STORAGE", app_module.HOSTS_STORAGE_INI)
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda func, *args: func(*args))
+    monkeypatch.setattr(app_module, "shortcuts", {})
+    shared = make_host(app_module)
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [shared]})
+    first = make_wmain_for_write(app_module)
+    first.writeConfig()
+    first.config_writer.flush()
+    first.patch_hosts = lambda new_groups: None
+
+    # la segunda instancia arranca con el mismo gcm.conf
+    second = make_wmain_for_write(app_module)
+    second.config_source = first.config_source
+    second.config_base = dict(first.config_base)
+    second.patch_hosts = lambda new_groups: None
+
+    added = make_host(app_module)
+    added.name = "switch"
+    app_module.groups = {"ops/prod": [shared, added]}
+    first.writeConfig()
+    first.config_writer.flush()
+
+    edited = shared.clone()
+    edited.description = "edited elsewhere"
+    app_module.groups = {"ops/prod": [edited]}
+    second.writeConfig()
+    second.config_writer.flush()
+
+    cp = configparser.RawConfigParser()
+    cp.read(tmp_path / "gcm.conf")
+    hosts = {
+        cp.get(section, "name"): cp.get(section, "description")
+        for section in cp.sections()
+        if section.startswith("host ")
+    }
+    assert hosts == {"router": "edited elsewhere", "switch": "edge router"}
+
+
+def test_config_writer_leaves_window_state_to_the_main_loop(tmp_path, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(tmp_path / "gcm.conf"))
+    monkeypatch.setattr(app_module.conf, "HOSTS_STORAGE", app_module.HOSTS_STORAGE_INI)
+    monkeypatch.setattr(app_module, "shortcuts", {})
+    idle = []
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda func, *args: idle.append((func, args)))
+    locked = []
+
+    def encrypt(_pwd, value):
+        # el bloqueo no se mantiene mientras se cifra
+        fd = app_module.os.open(app_module.CONFIG_FILE + ".lock", app_module.os.O_RDWR)
+        try:
+            app_module.fcntl.flock(fd, app_module.fcntl.LOCK_EX | app_module.fcntl.LOCK_NB)
+        except BlockingIOError:
+            locked.append(value)
+        finally:
+            app_module.os.close(fd)
+        return f"enc:{value}"
+
+    monkeypatch.setattr(app_module, "encrypt", encrypt)
+    (tmp_path / "gcm.conf.lock").touch()
+    host = make_host(app_module)
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [host]})
+    wmain = make_wmain_for_write(app_module)
+
+    wmain.writeConfig()
+    wmain.config_writer.flush()
+
+    cp = configparser.RawConfigParser()
+    cp.read(tmp_path / "gcm.conf")
+    assert cp.get("host 1", "pass") == "enc:secret"
+    assert locked == []
+    # the thread encrypted a copy, the host keeps its plain password
+    assert host.password_state() == ("secret", None)
+    assert (wmain.config_source, wmain.config_base) == (None, {})
+
+    for func, args in idle:
+        func(*args)
+    assert wmain.config_source == app_module.ConfigSnapshot.source_key()
+    assert wmain.config_base == {("ops/prod", "router"): host}
+
+
+def test_config_writer_coalesces_jobs_and_skips_unchanged_text(tmp_path, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "CONFIG_FILE", str(tmp_path / "gcm.conf"))
+    path = tmp_path / "gcm.conf"
+    synced = []
+    fsync = app_module.os.fsync
+    monkeypatch.setattr(app_module.os, "fsync", lambda fd: synced.append(fd) or fsync(fd))
+    writer = app_module.ConfigWriter()
+    writer.DELAY = 60
+    done = []
+
+    def job(text):
+        writer.write(path, text)
+        done.append(text)
+
+    writer.schedule(lambda: job("first"))
+    writer.schedule(lambda: job("second"))
+    writer.schedule(lambda: done.append("merge only"), replace=False)
+    writer.flush()
+
+    assert path.read_text() == "second"
+    assert done == ["second"]
+    assert len(synced) == 1
+
+    writer.schedule(lambda: job("second"))
+    writer.flush()
+    assert done == ["second", "second"]
+    assert len(synced) == 1
+
+    # another instance rewrote the file, the same text is written again
+    path.write_text("other instance")
+    writer.schedule(lambda: job("second"))
+    writer.flush()
+    assert path.read_text() == "second"
+    assert len(synced) == 2
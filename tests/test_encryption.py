@@ -30,7 +30,7 @@ def test_iter_blocks_splits_into_expected_chunks(app_module):
 def test_generate_keystream_matches_ecb_output(app_module):
     key = b"\x00" * 32
     iv = b"\x01" * 16
-    gen = app_module._generate_keystream(key, iv)
+    gen = app_module._generate_keystream(pyaes.AESModeOfOperationECB(key), iv)
     ecb = pyaes.AESModeOfOperationECB(key)
 
     expected_first = ecb.encrypt(iv)
@@ -40,6 +40,79 @@ def test_generate_keystream_matches_ecb_output(app_module):
     assert next(gen) == expected_second
 
 
+def test_aes_backends_produce_identical_output(app_module):
+    key = app_module._password_to_key("secret")
+    iv = b"\x02" * 16
+    data = app_module._pkcs7_pad(b"a password longer than one block")
+    expected = app_module.PyaesCipher(key).apply_keystream(iv, data)
+
+    for backend in app_module.AES_BACKENDS.values():
+        assert backend(key).apply_keystream(iv, data) == expected
+
+
+def test_ciphertext_decrypts_with_every_backend(app_module, monkeypatch: pytest.MonkeyPatch):
+    app_module.conf.VERSION = 1
+    for writer in app_module.AES_BACKENDS.values():
+        monkeypatch.setattr(app_module, "AES_BACKEND", writer)
+        ciphertext = app_module.encrypt("password", "hello world")
+        for reader in app_module.AES_BACKENDS.values():
+            monkeypatch.setattr(app_module, "AES_BACKEND", reader)
+            assert app_module.decrypt("password", ciphertext) == "hello world"
+
+
+def test_aes_backend_can_be_forced_from_environment(app_module, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("GCM_AES_BACKEND", "pyaes")
+    assert app_module._select_aes_backend() is app_module.PyaesCipher
+
+    monkeypatch.setenv("GCM_AES_BACKEND", "missing")
+    assert app_module._select_aes_backend() in app_module.AES_BACKENDS.values()
+
+
+def test_cipher_cache_derives_each_key_once(app_module, monkeypatch: pytest.MonkeyPatch):
+    app_module.conf.VERSION = 1
+    derived = []
+    original = app_module._password_to_key
+
+    def counting_password_to_key(secret):
+        derived.append(secret)
+        return original(secret)
+
+    monkeypatch.setattr(app_module, "_password_to_key", counting_password_to_key)
+
+    with app_module.cipher_cache():
+        values = [app_module.encrypt("one", f"host-{i}") for i in range(5)]
+        with app_module.cipher_cache():
+            decoded = [app_module.decrypt("one", value) for value in values]
+        app_module.encrypt("two", "other")
+
+    assert decoded == [f"host-{i}" for i in range(5)]
+    assert derived == ["one", "two"]
+
+    app_module.encrypt("one", "outside")
+    assert derived == ["one", "two", "one"]
+
+
+def test_encrypt_many_and_decrypt_many_match_single_calls(
+    app_module, monkeypatch: pytest.MonkeyPatch
+):
+    app_module.conf.VERSION = 1
+    values = ["", "short", "exactly16bytes!!", "x" * 40, "ünïcode"]
+    for backend in app_module.AES_BACKENDS.values():
+        monkeypatch.setattr(app_module, "AES_BACKEND", backend)
+        ciphertexts = app_module.encrypt_many("password", values)
+        assert len(set(ciphertexts)) == len(values)
+        assert [app_module.decrypt("password", value) for value in ciphertexts] == values
+
+        singles = [app_module.encrypt("password", value) for value in values]
+        assert app_module.decrypt_many("password", singles + ["", "c2hvcnQ="]) == values + ["", ""]
+
+
+def test_decrypt_many_handles_legacy_values(app_module):
+    app_module.conf.VERSION = 0
+    legacy = [app_module.encrypt_old("pw", value) for value in ("one", "two")]
+    assert app_module.decrypt_many("pw", legacy) == ["one", "two"]
+
+
 def test_encrypt_decrypt_round_trip(app_module):
     app_module.conf.VERSION = 1
     ciphertext = app_module.encrypt("password", "hello world")
@@ -47,6 +47,21 @@ def test_host_clone_returns_independent_copy(app_module):
     assert cloned.tunnel_as_string() == "L8080:localhost:80,L8443:localhost:443,extra"
 
 
+def test_host_keyword_construction_matches_positional_args(app_module):
+    host = make_sample_host(app_module)
+    rebuilt = app_module.Host(*host.to_args())
+    keyword = app_module.Host(group="infra", name="edge", host="10.0.0.1")
+
+    assert rebuilt.to_args() == host.to_args()
+    assert keyword.port == 22
+    assert keyword.type == "ssh"
+    assert keyword.tunnel == [""]
+    assert keyword.password is None
+    assert not hasattr(keyword, "__dict__")
+    # repeated values share one string
+    assert app_module.Host(group="".join(["in", "fra"])).group is keyword.group
+
+
 def test_hostutils_save_and_load_round_trip(app_module, monkeypatch):
     host = make_sample_host(app_module)
     config = configparser.RawConfigParser()
@@ -91,3 +106,207 @@ def test_hostutils_save_and_load_round_trip(app_module, monkeypatch):
     assert loaded.keep_alive == host.keep_alive
     assert loaded.backspace_key == host.backspace_key
     assert loaded.delete_key == host.delete_key
+
+
+def test_load_host_defers_password_decryption(app_module, monkeypatch):
+    config = configparser.RawConfigParser()
+    section = "host 1"
+    config.add_section(section)
+    for option, value in {
+        "group": "infra",
+        "name": "primary",
+        "host": "router.example.com",
+        "user": "netops",
+        "pass": "cipher-text",
+    }.items():
+        config.set(section, option, value)
+
+    calls = []
+
+    def fake_decrypt(pwd, value):
+        calls.append((pwd, value))
+        return "plaintext"
+
+    monkeypatch.setattr(app_module.conf, "VERSION", "1")
+    monkeypatch.setattr(app_module, "decrypt", fake_decrypt)
+    monkeypatch.setattr(app_module, "encrypt", lambda pwd, text: f"fresh:{text}")
+
+    loaded = app_module.HostUtils.load_host_from_ini(config, section, pwd="secret")
+    cloned = loaded.clone()
+    assert calls == []
+
+    app_module.HostUtils.save_host_to_ini(config, section, cloned, pwd="secret")
+    assert config.get(section, "pass") == "cipher-text"
+    assert calls == []
+
+    assert loaded.password == "plaintext"
+    assert loaded.password == "plaintext"
+    assert calls == [("secret", "cipher-text")]
+
+    app_module.HostUtils.save_host_to_ini(config, section, cloned, pwd="export")
+    assert config.get(section, "pass") == "fresh:plaintext"
+
+
+def test_load_host_decrypts_legacy_passwords_eagerly(app_module, monkeypatch):
+    config = configparser.RawConfigParser()
+    section = "host 1"
+    config.add_section(section)
+    for option in ("group", "name", "host", "user", "pass"):
+        config.set(section, option, option)
+
+    monkeypatch.setattr(app_module.conf, "VERSION", 0)
+    monkeypatch.setattr(app_module, "decrypt", lambda pwd, value: f"{pwd}/{value}")
+
+    loaded = app_module.HostUtils.load_host_from_ini(config, section, pwd="old-key")
+    monkeypatch.setattr(app_module, "decrypt", lambda pwd, value: "too late")
+
+    assert loaded.password == "old-key/pass"
+
+
+def test_diff_hosts_reports_removed_added_and_changed(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "decrypt", lambda _pwd, value: value[len("enc:") :])
+    kept = make_sample_host(app_module)
+    kept.set_encrypted_password("pw", "enc:topsecret")
+    gone = kept.clone()
+    gone.name = "gone"
+    renamed_port = kept.clone()
+    renamed_port.name = "edge"
+    new_password = kept.clone()
+    new_password.name = "switch"
+    new_password.password = "topsecret"
+
+    old = {"infra": [kept, gone, renamed_port, new_password]}
+    fresh = {}
+    for host in (kept, renamed_port, new_password):
+        copy = host.clone()
+        copy.set_encrypted_password("pw", f"enc:{host.password}")
+        fresh.setdefault("infra", []).append(copy)
+    fresh["infra"][1].port = "22"
+    fresh["infra"][2].set_encrypted_password("pw", "enc:changed")
+    added = kept.clone()
+    added.group = "infra/new"
+    fresh["infra/new"] = [added]
+
+    removed, new, changed = app_module.HostUtils.diff_hosts(old, fresh, "pw")
+
+    assert removed == [gone]
+    assert new == [added]
+    assert [(a.name, b.port) for a, b in changed] == [("edge", "22"), ("switch", "2200")]
+
+
+def test_inventory_emits_add_update_move_and_remove(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "groups", {})
+    events = []
+    inventory = app_module.HostInventory()
+    inventory.subscribe(lambda event, host, old: events.append((event, host, old)))
+
+    host = make_sample_host(app_module)
+    inventory.add(host)
+    edited = host.clone()
+    edited.port = "2222"
+    inventory.replace(host, edited)
+    moved = edited.clone()
+    moved.group = "dev"
+    inventory.replace(edited, moved)
+    inventory.remove(moved)
+
+    assert events == [
+        ("add", host, None),
+        ("update", edited, host),
+        ("move", moved, edited),
+        ("remove", moved, None),
+    ]
+    assert app_module.groups == {}
+
+
+def test_inventory_keeps_group_hosts_sorted_by_name(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "groups", {})
+    hosts = {}
+    for name in ("core", "access", "edge"):
+        hosts[name] = make_sample_host(app_module)
+        hosts[name].name = name
+        app_module.inventory.add(hosts[name])
+    renamed = hosts["core"].clone()
+    renamed.name = "backbone"
+    app_module.inventory.replace(hosts["core"], renamed)
+
+    assert [h.name for h in app_module.groups["infra"]] == ["access", "backbone", "edge"]
+
+
+def test_inventory_indexes_hosts_by_name_and_address(app_module, monkeypatch):
+    host = make_sample_host(app_module)
+    other = make_sample_host(app_module)
+    other.group = "dev/lab"
+    other.name = "lab1"
+    monkeypatch.setattr(app_module, "groups", {"infra": [host], "dev/lab": [other]})
+    inventory = app_module.HostInventory()
+
+    assert inventory.find("infra", "primary") is host
+    assert inventory.find("infra", "missing") is None
+    assert inventory.find_address("router.example.com") == [other, host]
+    assert inventory.match("dev/*") == [other]
+    assert inventory.match("router.*") == [other, host]
+
+    moved = host.clone()
+    moved.host = "10.0.0.1"
+    inventory.replace(host, moved)
+    assert inventory.find("infra", "primary") is moved
+    assert inventory.find_address("router.example.com") == [other]
+    assert inventory.find_address("10.0.0.1") == [moved]
+    inventory.remove(other)
+    assert inventory.find("dev/lab", "lab1") is None
+
+    # a new groups dict is indexed again
+    edge = make_sample_host(app_module)
+    edge.name = "edge"
+    monkeypatch.setattr(app_module, "groups", {"infra": [edge]})
+    assert inventory.find("infra", "primary") is None
+    assert inventory.find("infra", "edge") is edge
+
+
+def test_host_search_index_matches_substrings_of_any_field(app_module):
+    router = make_sample_host(app_module)
+    switch = make_sample_host(app_module)
+    switch.name = "access-switch"
+    switch.host = "10.0.0.2"
+    switch.user = "admin"
+    switch.description = "Floor 2"
+    index = app_module.HostSearchIndex([router, switch])
+
+    assert index.search("ROUTER.example") == {router}
+    assert index.search("infra") == {router, switch}
+    assert index.search("flo") == {switch}
+    assert index.search("2") == {switch}
+    assert index.search("nomatch") == set()
+    # narrowing the previous matches gives the same result
+    assert index.search("admin", {router, switch}) == {switch}
+
+    index.remove(switch)
+    switch.description = "basement"
+    index.add(switch)
+    assert index.search("floor") == set()
+    assert index.search("basem") == {switch}
+
+
+def test_host_search_index_ranks_quick_connect_results(app_module):
+    hosts = []
+    for name, address in (("db-backup", "10.0.0.1"), ("web1", "10.0.0.2"), ("webdb", "10.0.0.3")):
+        host = make_sample_host(app_module)
+        host.name = name
+        host.host = address
+        hosts.append(host)
+    backup, web, webdb = hosts
+    index = app_module.HostSearchIndex(hosts)
+
+    # a field starting with the word first, then the rest in index order
+    assert index.rank("db", 10, {}) == [backup, webdb]
+    assert index.rank("web", 10, {}) == [web, webdb]
+    assert index.rank("web", 10, {webdb: 2.0}) == [webdb, web]
+    # every word must match, the similar address comes after the exact one
+    assert index.rank("web 10.0.0.3", 10, {}) == [webdb, web]
+    assert index.rank("web", 1, {}) == [web]
+    # a typo still finds the host, after the exact matches
+    assert index.rank("db-bakup", 10, {}) == [backup]
+    assert index.rank("zzzz", 10, {web: 1.0}) == []
+    # without text, the recently used
+    assert index.rank("", 2, {web: 1.0, backup: 2.0}) == [backup, web]
@@ -103,13 +103,13 @@ class WmainStub:
             return self.donate
         raise KeyError(name)
 
-    def updateTree(self):
+    def update_row_color(self):
         self.tree_calls += 1
 
     def populateCommandsMenu(self):
         self.cmd_calls += 1
 
-    def writeConfig(self):
+    def save_settings(self):
         self.write_calls += 1
 
 
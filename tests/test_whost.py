@@ -126,13 +126,15 @@ def test_whost_on_okbutton_adds_host_and_updates_wmain(monkeypatch, app_module):
         def updateTree(self):
             self.tree_calls += 1
 
-        def writeConfig(self):
+        def save_host(self, host, old_group=None, old_name=None):
             self.write_calls += 1
 
     wmain_stub = WmainStub()
     monkeypatch.setattr(app_module, "wMain", wmain_stub, raising=False)
     captured = {}
     monkeypatch.setattr(app_module, "msgbox", lambda text: captured.setdefault("msg", text))
+    events = []
+    app_module.inventory.subscribe(lambda event, h, old: events.append(event))
 
     whost.on_okbutton1_clicked(None)
 
@@ -143,7 +145,8 @@ def test_whost_on_okbutton_adds_host_and_updates_wmain(monkeypatch, app_module):
     assert host.host == "router.example.com"
     assert host.user == "netops"
     assert host.term == "xterm-256color"
-    assert wmain_stub.tree_calls == 1
+    assert wmain_stub.tree_calls == 0
+    assert events == ["add"]
     assert wmain_stub.write_calls == 1
     assert destroy_stub.destroyed is True
 
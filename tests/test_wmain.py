@@ -52,6 +52,9 @@ class FakeTreeView:
     def get_selection(self):
         return self._selection
 
+    def get_model(self):
+        return self._selection.model
+
 
 class DummyTreeStore:
     def __init__(self):
@@ -108,6 +111,9 @@ class DummyMenu:
     def get_children(self):
         return list(self.children)
 
+    def connect(self, *args):
+        self.callbacks = getattr(self, "callbacks", []) + [args]
+
 
 class DummyMenuItem:
     def __init__(self, label):
@@ -149,26 +155,40 @@ class MenuItemStub:
 
 
 class TrackingTreeModel:
-    def __init__(self, owner):
-        self.owner = owner
-        self.folder_rows: list[tuple[str, str]] = []
+    def __init__(self):
+        self.folder_rows: list[tuple[object, str]] = []
         self.host_rows: list[list] = []
+        self.children: dict[int, list] = {}
 
     def clear(self):
         self.folder_rows.clear()
         self.host_rows.clear()
-
-    def prepend(self, parent, row):
-        path = getattr(self.owner, "_pending_path", "")
-        node = types.SimpleNamespace(label=row[0])
-        handle = types.SimpleNamespace(iter=node)
-        self.owner.folder_nodes[path] = handle
-        self.folder_rows.append((path, row[0]))
-        return handle
+        self.children.clear()
 
     def append(self, parent, row):
-        self.host_rows.append(row)
-        return types.SimpleNamespace(iter=None)
+        node = types.SimpleNamespace(label=row[0], parent=parent)
+        self.children.setdefault(id(parent), []).append(node)
+        if row[2] == "gtk-directory":
+            self.folder_rows.append((parent, row[0]))
+        else:
+            self.host_rows.append(row)
+        return node
+
+    def connect(self, *args):
+        pass
+
+    def get_string_from_iter(self, node):
+        index = str(self.children[id(node.parent)].index(node))
+        return f"{self.get_string_from_iter(node.parent)}:{index}" if node.parent else index
+
+    def iter_children(self, node):
+        return self.children[id(node)][0]
+
+    def remove(self, node):
+        for siblings in self.children.values():
+            if node in siblings:
+                siblings.remove(node)
+        self.host_rows = [row for row in self.host_rows if row[0] != node.label]
 
 
 class DeletionTreeModel:
@@ -243,9 +263,11 @@ def make_wmain_with_host(app_module, host, has_child=False):
 
 def make_wmain_for_tree(app_module):
     wmain = object.__new__(app_module.Wmain)
-    wmain.folder_nodes = {}
-    wmain.menu_nodes = {}
-    wmain.treeModel = TrackingTreeModel(wmain)
+    wmain.treeModel = TrackingTreeModel()
+    wmain.new_servers_model = TrackingTreeModel
+    wmain.treeServers = types.SimpleNamespace(set_model=lambda model: None)
+    wmain.expand_source = None
+    wmain.filter_text = ""
     wmain.menuServers = DummyMenu()
     wmain.nbConsole = object()
     wmain.get_collapsed_nodes = lambda: []
@@ -278,6 +300,8 @@ def test_duplicate_selected_host_clones_entry(monkeypatch, app_module):
     wmain.updateTree = lambda: calls.__setitem__("tree", calls["tree"] + 1)
     wmain.writeConfig = lambda: calls.__setitem__("write", calls["write"] + 1)
     wmain.get_group = lambda _iter: "ops/prod"
+    events = []
+    app_module.inventory.subscribe(lambda event, h, old: events.append((event, h.name)))
 
     wmain.duplicate_selected_host()
 
@@ -285,7 +309,85 @@ def test_duplicate_selected_host_clones_entry(monkeypatch, app_module):
     assert len(cloned_hosts) == 2
     assert cloned_hosts[1].name == "router (copy)"
     assert calls["write"] == 1
-    assert calls["tree"] == 1
+    assert calls["tree"] == 0
+    assert events == [("add", "router (copy)")]
+
+
+def test_open_cli_targets_accepts_names_addresses_and_patterns(monkeypatch, app_module):
+    host = make_host(app_module)
+    other = host.clone()
+    other.name = "switch"
+    other.host = "10.0.3.17"
+    dev = host.clone()
+    dev.group = "dev"
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [host, other], "dev": [dev]})
+    wmain = object.__new__(app_module.Wmain)
+    wmain.nbConsole = "console"
+    opened = []
+    wmain.addTab = lambda notebook, h: opened.append(h)
+
+    wmain.open_cli_targets(["ops/prod/switch", "10.0.3.17", "ops/*", "ops/prod/missing", "nohost"])
+
+    assert opened == [other, other, host, other]
+
+
+def test_index_hosts_in_idle_steps_and_quick_connect(monkeypatch, app_module):
+    host = make_host(app_module)
+    other = host.clone()
+    other.name = "switch"
+    dev = host.clone()
+    dev.group = "dev"
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [host, other], "dev": [dev]})
+    monkeypatch.setattr(app_module, "INDEX_HOSTS_STEP", 2)
+    idle = []
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda *args: idle.append(args) or 9)
+    wmain = object.__new__(app_module.Wmain)
+    wmain.index_source = None
+    wmain.recent_hosts = {("dev", "router"): 5.0}
+
+    wmain.index_hosts()
+    (callback,) = idle[0]
+    assert callback() is True
+    assert set(wmain.host_index.texts) == {host, other}
+
+    # the palette does not wait for the idle callbacks
+    assert wmain.quick_connect_hosts("router") == [dev, host, other]
+    assert wmain.index_source is None
+    assert wmain.quick_connect_hosts("swi") == [other]
+
+
+def test_index_hosts_leaves_unread_group_files_for_later(monkeypatch, app_module):
+    host = make_host(app_module)
+    other = host.clone()
+    other.name = "switch"
+    other.group = "dev"
+    files = {"ops/prod": [host], "dev": [other]}
+    loaded = []
+
+    class Store:
+        def load_group(self, group):
+            loaded.append(group)
+            return files[group]
+
+    monkeypatch.setattr(app_module, "groups", app_module.LazyGroups(Store(), ["ops/prod", "dev"]))
+    idle = []
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda *args: idle.append(args) or 9)
+    wmain = object.__new__(app_module.Wmain)
+    wmain.index_source = None
+    wmain.recent_hosts = {}
+
+    wmain.index_hosts()
+    (callback,) = idle[0]
+    assert callback() is False
+    assert loaded == []
+
+    # expanding the folder reads the file and indexes its hosts
+    app_module.groups["ops/prod"]
+    assert set(wmain.host_index.texts) == {host}
+
+    # a search reads the rest
+    assert wmain.quick_connect_hosts("switch") == [other]
+    assert loaded == ["ops/prod", "dev"]
 
 
 def test_copy_selected_address_sets_clipboard(monkeypatch, app_module):
@@ -362,10 +464,14 @@ def test_on_btnDel_clicked_removes_host(monkeypatch, app_module):
         app_module, "msgconfirm", lambda _text: app_module.Gtk.ResponseType.OK
     )
 
+    events = []
+    app_module.inventory.subscribe(lambda event, h, old: events.append((event, h)))
+
     wmain.on_btnDel_clicked(None)
 
-    assert app_module.groups[host.group] == []
-    assert calls["tree"] == 1
+    assert host.group not in app_module.groups
+    assert events == [("remove", host)]
+    assert calls["tree"] == 0
     assert calls["write"] == 1
 
 
@@ -380,6 +486,7 @@ def test_on_btnDel_clicked_removes_group(monkeypatch, app_module):
     wmain = object.__new__(app_module.Wmain)
     wmain.treeModel = model
     wmain.treeServers = tree
+    wmain.host_index = None
     calls = {"tree": 0, "write": 0}
     wmain.updateTree = lambda: calls.__setitem__("tree", calls["tree"] + 1)
     wmain.writeConfig = lambda: calls.__setitem__("write", calls["write"] + 1)
@@ -439,6 +546,67 @@ def test_get_target_terminal_prefers_context_then_active_then_current(app_module
     assert wmain.get_target_terminal() is fallback
 
 
+def test_url_regexes_are_compiled_once_for_every_terminal(monkeypatch, app_module):
+    compiled = []
+
+    def new_for_match(pattern, length, flags):
+        compiled.append(pattern)
+        if pattern == app_module.urlregex.EMAIL:
+            raise ValueError("no pcre2")
+        return ("regex", pattern)
+
+    monkeypatch.setattr(app_module, "_url_regexes", {})
+    monkeypatch.setattr(app_module.Vte.Regex, "new_for_match", new_for_match)
+
+    class Terminal:
+        def __init__(self):
+            self.regexes = []
+
+        def match_add_regex(self, regex, flags):
+            self.regexes.append(regex)
+            return len(self.regexes)
+
+        def match_set_cursor_name(self, tag, name):
+            pass
+
+    wmain = object.__new__(app_module.Wmain)
+    terminals = [Terminal(), Terminal()]
+    for terminal in terminals:
+        wmain.registerUrlRegexes(terminal)
+
+    patterns = [app_module.urlregex.DIRECT, app_module.urlregex.URL, app_module.urlregex.EMAIL]
+    # the failed pattern is not tried again
+    assert compiled == patterns
+    assert terminals[0].regexes == terminals[1].regexes
+    assert terminals[1].regexes == [("regex", patterns[0]), ("regex", patterns[1])]
+    assert (terminals[1].tag_direct, terminals[1].tag_url, terminals[1].tag_email) == (1, 2, None)
+
+
+def test_terminal_styles_are_shared_until_cleared(monkeypatch, app_module):
+    parsed = []
+
+    def parse_color_rgba(spec):
+        parsed.append(spec)
+        return types.SimpleNamespace(spec=spec, alpha=1)
+
+    monkeypatch.setattr(app_module, "_terminal_styles", {})
+    monkeypatch.setattr(app_module, "parse_color_rgba", parse_color_rgba)
+
+    style = app_module.get_terminal_style("monospace", "#FFFFFF", "#000000", 20)
+    for _i in range(100):
+        assert app_module.get_terminal_style("monospace", "#FFFFFF", "#000000", 20) is style
+    assert len(parsed) == len(app_module.TERMINAL_PALETTE) + 3
+    assert (style.foreground.spec, style.background.spec) == ("#FFFFFF", "#000000")
+    assert style.transparent_background.alpha == 0.8
+    assert style.transparent_background is not style.background
+
+    plain = app_module.get_terminal_style("monospace", "", "", 0)
+    assert (plain.foreground, plain.background, plain.transparent_background) == (None, None, None)
+
+    app_module.clear_terminal_styles()
+    assert app_module.get_terminal_style("monospace", "#FFFFFF", "#000000", 20) is not style
+
+
 def test_run_custom_command_invokes_vte_feed(monkeypatch, app_module):
     wmain = object.__new__(app_module.Wmain)
     terminal = app_module.Vte.Terminal()
@@ -622,34 +790,264 @@ def test_update_tree_rebuilds_structure(monkeypatch, app_module):
         {"ops": [base_host], "ops/prod": [child_host], "unused": []},
     )
     wmain = make_wmain_for_tree(app_module)
+    monkeypatch.setattr(app_module.Gtk, "MenuItem", DummyMenuItem)
+    monkeypatch.setattr(app_module.Gtk, "Menu", DummyMenu)
+    old_model = wmain.treeModel
+    attached = []
+    wmain.treeServers.set_model = lambda model: attached.append(model)
 
-    def fake_get_folder(_model, base, path):
-        wmain._pending_path = path
-        return wmain.folder_nodes.get(path)
+    wmain.updateTree()
 
-    def fake_get_folder_menu(menu, base, path):
-        wmain._pending_menu_path = path
-        return wmain.menu_nodes.get(path)
+    # the rows are loaded into a new model, shown once it is complete
+    assert wmain.treeModel is not old_model
+    assert attached == [wmain.treeModel]
+    assert "unused" not in app_module.groups
+    assert wmain.treeModel.host_rows[0][0] == "beta"
+    assert wmain.treeModel.host_rows[1][0] == "alpha"
+    assert sorted(wmain.folder_iters) == ["/ops", "/ops/prod"]
+    assert wmain.treeModel.folder_rows == [
+        (None, "ops"),
+        (wmain.folder_iters["/ops"], "prod"),
+    ]
+
+    # only the first level of the servers menu is built
+    assert list(wmain.folder_menus) == [""]
+    (ops_item,) = wmain.menuServers.children
+    submenu = ops_item.get_submenu()
+    assert ops_item.get_label() == "ops"
+    assert submenu.children == []
+
+    (signal, callback, path) = submenu.callbacks[0]
+    callback(submenu, path)
+    callback(submenu, path)
+
+    assert signal == "show"
+    assert wmain.folder_menus["/ops"] is submenu
+    assert [item.get_label() for item in submenu.children] == ["prod", "alpha"]
+    assert submenu.children[0].get_submenu().children == []
+
+
+def test_update_tree_leaves_unread_groups_as_placeholders(monkeypatch, app_module):
+    loaded = []
+
+    class Store:
+        def load_group(self, group):
+            loaded.append(group)
+            return []
+
+    monkeypatch.setattr(app_module, "groups", app_module.LazyGroups(Store(), ["ops/prod"]))
+    wmain = make_wmain_for_tree(app_module)
+    monkeypatch.setattr(app_module.Gtk, "MenuItem", DummyMenuItem)
+    monkeypatch.setattr(app_module.Gtk, "Menu", DummyMenu)
 
-    wmain.get_folder = fake_get_folder
-    wmain.get_folder_menu = fake_get_folder_menu
+    wmain.updateTree()
+
+    assert loaded == []
+    assert wmain.treeModel.host_rows == [[app_module._("Cargando..."), None, None]]
+    assert wmain.unfilled_folders == {"/ops/prod"}
+    assert [item.get_label() for item in wmain.menuServers.children] == ["ops"]
 
-    class RecordingMenuItem(DummyMenuItem):
-        def set_submenu(self, menu):
-            super().set_submenu(menu)
-            wmain.menu_nodes[wmain._pending_menu_path] = menu
 
-    monkeypatch.setattr(app_module.Gtk, "MenuItem", RecordingMenuItem)
+def test_update_tree_fills_collapsed_folders_when_expanded(monkeypatch, app_module):
+    host = make_host(app_module)
+    other = host.clone()
+    other.group = "dev"
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [host], "dev": [other]})
+    monkeypatch.setattr(app_module.conf, "COLLAPSED_FOLDERS", "ops")
+    wmain = make_wmain_for_tree(app_module)
+    monkeypatch.setattr(app_module.Gtk, "MenuItem", DummyMenuItem)
     monkeypatch.setattr(app_module.Gtk, "Menu", DummyMenu)
 
     wmain.updateTree()
 
-    assert "unused" not in app_module.groups
-    assert wmain.treeModel.host_rows[0][0] == "beta"
-    assert wmain.treeModel.host_rows[1][0] == "alpha"
-    assert "/ops" in wmain.folder_nodes
-    assert "/ops/prod" in wmain.folder_nodes
-    assert "/ops" in wmain.menu_nodes
+    # "ops" is collapsed: only its placeholder is in the model
+    assert wmain.unfilled_folders == {"/ops"}
+    assert sorted(wmain.folder_iters) == ["/dev", "/ops"]
+    assert [row[0] for row in wmain.treeModel.host_rows] == ["router", app_module._("Cargando...")]
+
+    expanded = []
+    wmain.treeServers.expand_row = lambda path, open_all: expanded.append(path)
+    wmain.treeModel.get_path = wmain.treeModel.get_string_from_iter
+    idle = []
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda *args: idle.append(args) or 7)
+    monkeypatch.setattr(app_module, "EXPAND_FOLDERS_STEP", 2)
+
+    wmain.expand_all_groups()
+    (callback, pending) = idle[0]
+    assert callback(pending) is True
+    assert callback(pending) is False
+
+    assert wmain.unfilled_folders == set()
+    assert sorted(wmain.folder_iters) == ["/dev", "/ops", "/ops/prod"]
+    assert [row[0] for row in wmain.treeModel.host_rows] == ["router", "router"]
+    assert expanded == ["0", "1", "1:0"]
+    assert wmain.expand_source is None
+
+
+class FilterModelStub:
+    """TreeModelFilter over a TrackingTreeModel, with the same paths."""
+
+    def __init__(self, model):
+        self.model = model
+        self.visible = None
+        self.refilters = 0
+
+    def set_visible_func(self, func):
+        self.visible = func
+
+    def refilter(self):
+        self.refilters += 1
+
+    def convert_child_path_to_path(self, path):
+        return path
+
+    def convert_iter_to_child_iter(self, iter_):
+        return ("child", iter_)
+
+
+def test_filter_hosts_fills_matching_folders_from_idle_callbacks(monkeypatch, app_module):
+    host = make_host(app_module)
+    other = host.clone()
+    other.group = "dev"
+    other.name = "builder"
+    other.description = "build server"
+    other.host = "builder.example.com"
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [host], "dev": [other]})
+    monkeypatch.setattr(app_module.conf, "COLLAPSED_FOLDERS", "ops")
+    wmain = make_wmain_for_tree(app_module)
+    monkeypatch.setattr(app_module.Gtk, "MenuItem", DummyMenuItem)
+    monkeypatch.setattr(app_module.Gtk, "Menu", DummyMenu)
+    wmain.updateTree()
+
+    models = []
+    expanded = []
+    wmain.treeServers = types.SimpleNamespace(
+        set_model=models.append, expand_row=lambda path, open_all: expanded.append(path)
+    )
+    wmain.treeModel.get_path = wmain.treeModel.get_string_from_iter
+    wmain.treeModel.filter_new = lambda: FilterModelStub(wmain.treeModel)
+    wmain.host_index = app_module.HostSearchIndex([host, other])
+    wmain.index_source = None
+    wmain.index_unloaded = set()
+    wmain.filter_matches = None
+    wmain.filter_refresh_source = None
+    wmain.get_collapsed_nodes = lambda: ["ops"]
+    idle = []
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda *args: idle.append(args) or 7)
+    monkeypatch.setattr(app_module, "EXPAND_FOLDERS_STEP", 1)
+
+    wmain.filter_hosts("rout")
+
+    # nothing is filled or expanded before the idle callbacks run
+    assert models == [None, wmain.treeFilter]
+    assert wmain.unfilled_folders == {"/ops"}
+    assert wmain.filter_folders == {"ops", "ops/prod"}
+    assert expanded == []
+    (callback, pending, subfolders) = idle.pop()
+    assert callback(pending, subfolders) is True
+    assert callback(pending, subfolders) is False
+    assert wmain.unfilled_folders == set()
+    assert expanded == ["1", "1:0"]
+    assert wmain.expand_source is None
+
+    router_row = wmain.treeModel.children[id(wmain.folder_iters["/ops/prod"])][0]
+    builder_row = wmain.treeModel.children[id(wmain.folder_iters["/dev"])][0]
+    hosts = {id(router_row): host, id(builder_row): other}
+    folders = {id(row) for row in wmain.folder_iters.values()}
+    wmain.treeModel.get_value = lambda row, column: [
+        row.label,
+        hosts.get(id(row)),
+        "gtk-directory" if id(row) in folders else "gtk-network",
+    ][column]
+    wmain.treeModel.iter_parent = lambda row: row.parent
+    assert wmain.is_row_visible(wmain.treeModel, router_row) is True
+    assert wmain.is_row_visible(wmain.treeModel, builder_row) is False
+    assert wmain.is_row_visible(wmain.treeModel, wmain.folder_iters["/ops/prod"]) is True
+    assert wmain.is_row_visible(wmain.treeModel, wmain.folder_iters["/dev"]) is False
+
+    # changes to the hosts are filtered again once, from an idle callback
+    wmain.refresh_host_filter()
+    wmain.refresh_host_filter()
+    assert len(idle) == 1
+    monkeypatch.setattr(app_module.GLib, "source_remove", lambda source: None)
+    assert idle.pop()[0]() is False
+    assert wmain.filter_refresh_source is None
+    assert wmain.treeFilter.refilters == 2
+
+    restored = []
+    wmain.set_collapsed_nodes = restored.append
+    wmain.clear_host_filter()
+    assert (wmain.filter_text, wmain.treeFilter) == ("", None)
+    assert models[-1] is wmain.treeModel
+    assert restored == [["ops"]]
+
+
+def test_to_model_iter_converts_filter_iters(app_module):
+    wmain = object.__new__(app_module.Wmain)
+    wmain.treeModel = TrackingTreeModel()
+    filter_model = FilterModelStub(wmain.treeModel)
+
+    assert wmain.to_model_iter(wmain.treeModel, "0:1") == "0:1"
+    assert wmain.to_model_iter(filter_model, "0:1") == ("child", "0:1")
+    assert wmain.to_model_iter(filter_model, None) is None
+
+
+def test_collapsed_nodes_are_group_paths(monkeypatch, app_module):
+    wmain = object.__new__(app_module.Wmain)
+    wmain.filter_text = ""
+    wmain.folder_iters = {"/dev": "0", "/ops": "1", "/ops/prod": "1:0", "/ops/test": "1:1"}
+    wmain.unfilled_folders = {"/dev"}
+    wmain.treeModel = types.SimpleNamespace(get_path=lambda row: row)
+    expanded = []
+    wmain.treeServers = types.SimpleNamespace(
+        row_expanded=lambda path: path in ("1", "1:1"),
+        expand_row=lambda path, open_all: expanded.append(path),
+    )
+
+    assert wmain.get_collapsed_nodes() == ["dev", "ops/prod"]
+
+    # only the filled folders that were not collapsed are expanded, parents first
+    wmain.set_collapsed_nodes({"ops/prod"})
+    assert expanded == ["1", "1:1"]
+
+
+def test_servers_cell_data_stripes_visible_rows(monkeypatch, app_module):
+    # "ops" is expanded with two hosts, "dev" is collapsed
+    first_child = {None: "0", "0": "0:0", "1": "1:0"}
+    next_sibling = {"0": "1", "0:0": "0:1"}
+    model = types.SimpleNamespace(
+        iter_children=first_child.get,
+        iter_next=next_sibling.get,
+        get_path=lambda i: types.SimpleNamespace(to_string=lambda: i),
+        get_string_from_iter=lambda i: i,
+    )
+    wmain = object.__new__(app_module.Wmain)
+    wmain.treeModel = model
+    wmain.treeServers = types.SimpleNamespace(
+        get_model=lambda: model, row_expanded=lambda path: path.to_string() == "0"
+    )
+    wmain.color_back1 = "even"
+    wmain.color_back2 = "odd"
+    wmain.visible_rows = None
+
+    class Cell:
+        def set_property(self, name, value):
+            self.background = value
+
+    cell = Cell()
+    colors = []
+    for row in ("0", "0:0", "0:1", "1"):
+        wmain.servers_cell_data(None, cell, model, row)
+        colors.append(cell.background)
+
+    assert wmain.visible_rows == {"0": 0, "0:0": 1, "0:1": 2, "1": 3}
+    assert colors == ["even", "odd", "even", "odd"]
+
+    monkeypatch.setattr(app_module.conf, "DISABLE_HOSTS_STRIPES", True)
+    wmain.invalidate_row_stripes()
+    wmain.servers_cell_data(None, cell, model, "1")
+    assert cell.background == "even"
+    assert wmain.visible_rows == {"0": 0, "0:0": 1, "0:1": 2, "1": 3}
 
 
 def test_terminal_copy_helpers(monkeypatch, app_module):
@@ -711,6 +1109,42 @@ def test_on_contents_changed_uses_format_api(monkeypatch, app_module):
     assert terminal.log.entries == ["formatted"]
 
 
+class ProgressStub:
+    def __init__(self):
+        self.visible = False
+        self.text = None
+        self.fraction = None
+
+    def show(self):
+        self.visible = True
+
+    def hide(self):
+        self.visible = False
+
+    def set_text(self, text):
+        self.text = text
+
+    def set_fraction(self, fraction):
+        self.fraction = fraction
+
+
+def make_wmain_for_transfer(monkeypatch, app_module):
+    """Wmain whose background tasks run synchronously, idle callbacks included."""
+    monkeypatch.setattr(app_module.BackgroundTask, "start", app_module.BackgroundTask.run)
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda func, *args: func(*args))
+    wmain = object.__new__(app_module.Wmain)
+    wmain.window = object()
+    wmain.wMain = object()
+    wmain.background_task = None
+    wmain.boxProgress = ProgressStub()
+    wmain.progressBar = ProgressStub()
+    wmain.saved_hosts = 0
+    wmain.host_index = None
+    wmain.index_source = None
+    wmain.save_all_hosts = lambda: setattr(wmain, "saved_hosts", wmain.saved_hosts + 1)
+    return wmain
+
+
 def test_importar_servidores_loads_hosts(monkeypatch, tmp_path, app_module):
     host = make_host(app_module)
     password = "secretpw"
@@ -719,17 +1153,13 @@ def test_importar_servidores_loads_hosts(monkeypatch, tmp_path, app_module):
     monkeypatch.setattr(app_module, "encrypt", lambda _pwd, value: value)
     monkeypatch.setattr(app_module, "decrypt", lambda _pwd, value: value)
 
-    exporter = object.__new__(app_module.Wmain)
-    exporter.window = object()
-    exporter.wMain = object()
+    exporter = make_wmain_for_transfer(monkeypatch, app_module)
     monkeypatch.setattr(app_module, "groups", {"ops/prod": [host]})
     monkeypatch.setattr(app_module, "show_open_dialog", lambda **kwargs: str(filename))
     monkeypatch.setattr(app_module, "inputbox", lambda *args, **kwargs: password)
     exporter.on_exportar_servidores1_activate(None)
 
-    wmain = object.__new__(app_module.Wmain)
-    wmain.window = object()
-    wmain.wMain = object()
+    wmain = make_wmain_for_transfer(monkeypatch, app_module)
     called = {"update": 0}
     wmain.updateTree = lambda: called.__setitem__("update", called["update"] + 1)
 
@@ -746,6 +1176,7 @@ def test_importar_servidores_loads_hosts(monkeypatch, tmp_path, app_module):
     assert messages == []
     assert "ops/prod" in app_module.groups
     assert called["update"] == 1
+    assert wmain.saved_hosts == 1
     imported = app_module.groups["ops/prod"][0]
     assert imported.name == host.name
     assert imported.host == host.host
@@ -756,9 +1187,7 @@ def test_exportar_servidores_writes_encrypted_hosts(monkeypatch, tmp_path, app_m
     password = "secretpw"
     filename = tmp_path / "export.ini"
 
-    wmain = object.__new__(app_module.Wmain)
-    wmain.window = object()
-    wmain.wMain = object()
+    wmain = make_wmain_for_transfer(monkeypatch, app_module)
 
     monkeypatch.setattr(app_module, "show_open_dialog", lambda **kwargs: str(filename))
     monkeypatch.setattr(app_module, "inputbox", lambda *args, **kwargs: password)
@@ -771,6 +1200,131 @@ def test_exportar_servidores_writes_encrypted_hosts(monkeypatch, tmp_path, app_m
     assert cp.get("gcm", "gcm")
     assert cp.get("host 1", "group") == "ops/prod"
     assert cp.get("host 1", "name") == host.name
+
+
+def test_export_import_round_trip_decrypts_passwords_in_bulk(monkeypatch, tmp_path, app_module):
+    hosts = []
+    for i in range(3):
+        host = make_host(app_module)
+        host.name = f"router{i}"
+        host.password = f"secret{i}"
+        hosts.append(host)
+    filename = tmp_path / "export.ini"
+
+    wmain = make_wmain_for_transfer(monkeypatch, app_module)
+    wmain.updateTree = lambda: None
+    monkeypatch.setattr(app_module.conf, "VERSION", 1)
+    monkeypatch.setattr(app_module, "show_open_dialog", lambda **kwargs: str(filename))
+    monkeypatch.setattr(app_module, "inputbox", lambda *args, **kwargs: "exportpw")
+    monkeypatch.setattr(
+        app_module, "msgconfirm", lambda *_args, **_kwargs: app_module.Gtk.ResponseType.OK
+    )
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": hosts})
+
+    wmain.on_exportar_servidores1_activate(None)
+    monkeypatch.setattr(app_module, "groups", {})
+    wmain.on_importar_servidores1_activate(None)
+
+    imported = app_module.groups["ops/prod"]
+    assert [host._encrypted_password for host in imported] == [None, None, None]
+    assert [host.password for host in imported] == ["secret0", "secret1", "secret2"]
+    assert wmain.background_task is None
+    assert wmain.boxProgress.visible is False
+    assert wmain.progressBar.fraction == 1.0
+
+
+def test_export_leaves_window_hosts_encrypted(monkeypatch, tmp_path, app_module):
+    monkeypatch.setattr(app_module.conf, "VERSION", 1)
+    host = make_host(app_module)
+    host.set_encrypted_password("configpw", app_module.encrypt("configpw", "secret"))
+    filename = tmp_path / "export.ini"
+
+    wmain = make_wmain_for_transfer(monkeypatch, app_module)
+    monkeypatch.setattr(app_module, "show_open_dialog", lambda **kwargs: str(filename))
+    monkeypatch.setattr(app_module, "inputbox", lambda *args, **kwargs: "exportpw")
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [host]})
+
+    wmain.on_exportar_servidores1_activate(None)
+
+    cp = configparser.RawConfigParser()
+    cp.read(filename)
+    assert app_module.decrypt("exportpw", cp.get("host 1", "pass")) == "secret"
+    # only the copies given to the thread were decrypted
+    assert host._encrypted_password is not None
+
+
+def test_cancelled_export_does_not_replace_the_file(monkeypatch, tmp_path, app_module):
+    filename = tmp_path / "export.ini"
+    filename.write_text("previous export")
+
+    wmain = make_wmain_for_transfer(monkeypatch, app_module)
+    monkeypatch.setattr(app_module, "show_open_dialog", lambda **kwargs: str(filename))
+    monkeypatch.setattr(app_module, "inputbox", lambda *args, **kwargs: "exportpw")
+    monkeypatch.setattr(app_module, "groups", {"ops/prod": [make_host(app_module)]})
+    save_hosts_to_ini = app_module.HostUtils.save_hosts_to_ini
+
+    def cancel_while_writing(*args):
+        wmain.on_btnCancelProgress_clicked(None)
+        save_hosts_to_ini(*args)
+
+    monkeypatch.setattr(app_module.HostUtils, "save_hosts_to_ini", cancel_while_writing)
+
+    wmain.on_exportar_servidores1_activate(None)
+
+    assert filename.read_text() == "previous export"
+    assert not (tmp_path / "export.ini.tmp").exists()
+    assert wmain.boxProgress.visible is False
+
+
+def test_background_task_reports_progress_and_stops_when_cancelled(monkeypatch, app_module):
+    monkeypatch.setattr(app_module.GLib, "idle_add", lambda func, *args: func(*args))
+    progress = []
+    done = []
+    task = None
+
+    def work(chunk):
+        if chunk == 2:
+            task.cancel()
+        return chunk * 10
+
+    task = app_module.BackgroundTask(
+        [1, 2, 3],
+        work,
+        sum,
+        lambda count, total: progress.append((count, total)),
+        lambda result, error: done.append((result, error)),
+    )
+    task.run()
+
+    assert progress == [(1, 3)]
+    assert done == []
+
+    task = app_module.BackgroundTask(
+        [1, 2], lambda chunk: chunk, sum, lambda *_args: None, lambda *args: done.append(args)
+    )
+    task.run()
+    assert done == [(3, None)]
+
+
+def test_cancel_progress_hides_bar_and_discards_import(monkeypatch, app_module):
+    wmain = make_wmain_for_transfer(monkeypatch, app_module)
+    monkeypatch.setattr(app_module.BackgroundTask, "start", lambda self: None)
+    finished = []
+
+    task = wmain.start_background_task(
+        "title", [[]], lambda chunk: chunk, None, lambda *args: finished.append(args)
+    )
+    assert wmain.boxProgress.visible is True
+    assert wmain.progressBar.text == "title"
+
+    wmain.on_btnCancelProgress_clicked(None)
+    task.run()
+
+    assert finished == []
+    assert wmain.background_task is None
+    assert wmain.boxProgress.visible is False
+
+
 class DummyTreeNode:
     def __init__(self, label, host=None):
         self.label = label